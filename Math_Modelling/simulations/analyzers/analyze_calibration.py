@@ -1,6 +1,7 @@
 import argparse
 import os
 import manifest
+import pandas as pd
 from idmtools.analysis.analyze_manager import AnalyzeManager
 from idmtools.core import ItemType
 from idmtools.core.platform_factory import Platform
@@ -9,6 +10,16 @@ from simulation_emodpy.analyzer.analyzer_collection import (
     AnnualAgebinPfPRAnalyzer,
     MonthlyAgebinPfPRAnalyzer,
 )
+from simulation_emodpy.analyzer.local_analyze import (
+    LocalAnalyzeManager,
+    build_output_index,
+    find_experiment_dir,
+)
+from simulation_emodpy.analyzer.result_cache import ResultCache, cached_analyze
+from simulation_emodpy.analyzer.score_calibration import (
+    score_particles,
+    select_particles,
+)
 
 
 def parse_args():
@@ -18,6 +29,28 @@ def parse_args():
     )
     parser.add_argument("-name", dest="expt_name", type=str, required=False)
     parser.add_argument("-id", dest="expt_id", type=str, required=True)
+    parser.add_argument("-local", dest="local", action="store_true")
+    parser.add_argument("-streaming", dest="streaming", action="store_true")
+    parser.add_argument("-instrument", dest="instrument", action="store_true")
+    parser.add_argument("-cache", dest="cache", action="store_true")
+    parser.add_argument(
+        "-filter_exists", dest="filter_exists", choices=["path", "index"], default=None
+    )
+    parser.add_argument(
+        "-output_format",
+        dest="output_format",
+        choices=["csv", "parquet"],
+        default="csv",
+    )
+    parser.add_argument(
+        "-no_compact_dtypes", dest="compact_dtypes", action="store_false"
+    )
+    parser.add_argument("-targets", dest="targets", type=str, default=None)
+    parser.add_argument("-samples", dest="samples", type=str, default=None)
+    parser.add_argument(
+        "-likelihood", dest="likelihood", type=str, default="binomial"
+    )
+    parser.add_argument("-n_select", dest="n_select", type=int, default=1)
 
     return parser.parse_args()
 
@@ -38,34 +71,77 @@ if __name__ == "__main__":
     end_year = 2022
 
     sweep_variables = ["Sample_ID", "DS_Name", "archetype", "Run_Number"]
+    # -filter_exists path checks every file, index lists the outputs once
+    filter_exists = {"path": True, "index": "index"}.get(args.filter_exists, False)
 
-    platform = Platform("SLURM_LOCAL", job_directory=manifest.job_dir)
-
-    with platform:
-        analyzers = []
-        analyzers.append(
-            MonthlyAgebinPfPRAnalyzer(
-                sweep_variables=sweep_variables,
-                working_dir=wdir,
-                start_year=start_year,
-                end_year=end_year,
-            )
+    analyzers = []
+    analyzers.append(
+        MonthlyAgebinPfPRAnalyzer(
+            sweep_variables=sweep_variables,
+            working_dir=wdir,
+            streaming=args.streaming,
+            instrument=args.instrument,
+            filter_exists=filter_exists,
+            output_format=args.output_format,
+            compact_dtypes=args.compact_dtypes,
+            start_year=start_year,
+            end_year=end_year,
         )
-        analyzers.append(
-            AnnualAgebinPfPRAnalyzer(
-                sweep_variables=sweep_variables,
-                working_dir=wdir,
-                start_year=start_year,
-                end_year=end_year - 1,
-            )
+    )
+    analyzers.append(
+        AnnualAgebinPfPRAnalyzer(
+            sweep_variables=sweep_variables,
+            working_dir=wdir,
+            streaming=args.streaming,
+            instrument=args.instrument,
+            filter_exists=filter_exists,
+            output_format=args.output_format,
+            compact_dtypes=args.compact_dtypes,
+            start_year=start_year,
+            end_year=end_year - 1,
         )
+    )
 
-        manager = AnalyzeManager(
-            configuration={},
-            ids=[(args.expt_id, ItemType.EXPERIMENT)],
+    cache = ResultCache() if args.cache else None
+    if args.local:
+        cached_analyze(
+            LocalAnalyzeManager,
+            cache=cache,
+            job_dir=manifest.job_dir,
+            ids=[args.expt_id],
             analyzers=analyzers,
             partial_analyze_ok=True,
             max_workers=16,
         )
+    else:
+        platform = Platform("SLURM_LOCAL", job_directory=manifest.job_dir)
 
-        manager.analyze()
+        if filter_exists == "index":
+            # Build the output index once here for the workers to share
+            build_output_index(
+                analyzers, [find_experiment_dir(manifest.job_dir, args.expt_id)]
+            )
+        with platform:
+            cached_analyze(
+                AnalyzeManager,
+                cache=cache,
+                configuration={},
+                ids=[(args.expt_id, ItemType.EXPERIMENT)],
+                analyzers=analyzers,
+                partial_analyze_ok=True,
+                max_workers=16,
+            )
+
+    if args.targets:
+        if args.output_format == "parquet":
+            read_output = pd.read_parquet
+        else:
+            read_output = pd.read_csv
+        scores = score_particles(
+            read_output(analyzers[0].output_path()),
+            pd.read_csv(args.targets),
+            likelihood=args.likelihood,
+        )
+        samples_df = pd.read_csv(args.samples) if args.samples else None
+        selected = select_particles(scores, args.n_select, samples_df)
+        selected.to_csv(os.path.join(wdir, "selected_particles.csv"), index=False)
@@ -1,17 +1,1003 @@
-from datetime import datetime
+import functools
+import io
+import json
 import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 from idmtools.entities import IAnalyzer
 from idmtools.entities.simulation import Simulation
 
+from simulation_emodpy.analyzer.report_readers import (  # noqa: F401
+    JSON_BACKEND,
+    read_summary_report,
+)
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+AGEBIN_CHANNELS = {
+    "PfPR by Age Bin": "PfPR",
+    "Annual Clinical Incidence by Age Bin": "Cases",
+    "Annual Severe Incidence by Age Bin": "Severe cases",
+    "New Infections by Age Bin": "New infections",
+    "Average Population by Age Bin": "Pop",
+}
+
+# Compact dtypes of the long-format agebin outputs
+OUTPUT_SCHEMA = {
+    "DS_Name": "category",
+    "archetype": "category",
+    "year": "int16",
+    "month": "int16",
+    # Age bins stay categorical, with the labels written in the report (1, not 1.0)
+    "agebin": "category",
+    "Sample_ID": "int32",
+    "Run_Number": "int32",
+    **{measure: "float32" for measure in AGEBIN_CHANNELS.values()},
+}
+
+
+read_agebin_report = functools.partial(
+    read_summary_report, channels=list(AGEBIN_CHANNELS)
+)
+
+
+def decode_agebin_channels(report, channels=None, n_times=None):
+    """
+    Decode the DataByTimeAndAgeBins block of a MalariaSummaryReport into a
+    dense array of shape (time, agebin, channel).
+
+    Args:
+        report: parsed MalariaSummaryReport
+        channels: DataByTimeAndAgeBins channel names, in output order
+        n_times: keep only the first n_times time steps (all if None)
+
+    Returns:
+        (age_bins, array)
+    """
+    channels = channels or list(AGEBIN_CHANNELS)
+    age_bins = report["Metadata"]["Age Bins"]
+    block = report["DataByTimeAndAgeBins"]
+    arr = np.asarray([block[c][:n_times] for c in channels], dtype=np.float64)
+
+    return age_bins, np.moveaxis(arr, 0, -1)
+
+
+def agebin_long_frame(age_bins, arr, time_col, time_values, channels=None):
+    """
+    Flatten a (time, agebin, channel) array into the long format written by
+    the agebin analyzers: one row per time step and agebin.
+    """
+    channels = channels or list(AGEBIN_CHANNELS)
+    n_times, n_ages, n_channels = arr.shape
+    values = arr.reshape(n_times * n_ages, n_channels)
+
+    # Keep the age bins exactly as written in the report (e.g. 1 vs 1.0)
+    agebin = pd.Categorical.from_codes(
+        np.tile(np.arange(n_ages), n_times),
+        categories=pd.Index(age_bins, dtype=object),
+    )
+    df = pd.DataFrame(
+        {
+            "agebin": agebin,
+            time_col: np.repeat(np.asarray(time_values), n_ages),
+        }
+    )
+    for i, channel in enumerate(channels):
+        df[AGEBIN_CHANNELS.get(channel, channel)] = values[:, i]
+
+    return df
+
+
+def apply_output_schema(df, schema=None):
+    """
+    Cast the columns of a map output to the dtypes of schema (OUTPUT_SCHEMA by
+    default). Absent columns are skipped, and so are integer columns whose
+    values are not integers (e.g. a string Sample_ID tag).
+    """
+    schema = schema or OUTPUT_SCHEMA
+    for col, dtype in schema.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if dtype.startswith("int") and not pd.api.types.is_integer_dtype(df[col]):
+            continue
+        try:
+            df[col] = df[col].astype(dtype)
+        except (TypeError, ValueError):
+            pass
+
+    return df
+
+
+def concat_frames(frames):
+    """
+    pd.concat that keeps categorical columns categorical when the frames have
+    different categories, by setting every frame to the union of categories.
+    """
+    categories, category_dtypes, plain = {}, {}, set()
+    for df in frames:
+        for col, dtype in df.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                union = categories.setdefault(col, {})
+                union.update(dict.fromkeys(dtype.categories))
+                category_dtypes.setdefault(col, set()).add(dtype.categories.dtype)
+            else:
+                plain.add(col)
+
+    # Keep the dtype of the categories (e.g. object age bins written as 1 and
+    # 0.25) rather than letting pandas infer a new one from the union
+    dtypes = {
+        col: pd.CategoricalDtype(
+            pd.Index(
+                list(union),
+                dtype=(
+                    next(iter(category_dtypes[col]))
+                    if len(category_dtypes[col]) == 1
+                    else object
+                ),
+            )
+        )
+        for col, union in categories.items()
+        if col not in plain
+    }
+    if dtypes:
+        frames = [
+            df.astype({c: t for c, t in dtypes.items() if c in df.columns})
+            for df in frames
+        ]
+
+    return pd.concat(frames)
+
+
+EmodCalendar = namedtuple(
+    "EmodCalendar", ["year", "month", "valid", "starts", "dates"]
+)
+
+
+@functools.lru_cache(maxsize=32)
+def emod_calendar(start_year, duration):
+    """
+    Map simulation days 0..duration-1 onto calendar months, using 365-day
+    years and 30-day months starting on day 1 of each year. Day 0 and days
+    361-364 of each year fall outside months 1-12.
+
+    Built once per (start_year, duration) and cached, so the arrays are
+    read-only.
+
+    Returns:
+        EmodCalendar of
+            year, month: per-day calendar year and month
+            valid: per-day mask of days inside months 1-12
+            starts: index of the first day of each month among the valid days
+            dates: first day of each month, as datetime64
+    """
+    time = np.arange(duration)
+    day = time % 365
+    month = (day - 1) // 30 + 1
+    year = time // 365 + start_year
+    valid = (month >= 1) & (month <= 12)
+
+    month_id = year[valid] * 12 + month[valid] - 1
+    starts = np.flatnonzero(np.diff(month_id, prepend=-1))
+    dates = (
+        (month_id[starts] - 1970 * 12).astype("datetime64[M]").astype("datetime64[D]")
+    )
+
+    calendar = EmodCalendar(year, month, valid, starts, dates)
+    for arr in calendar:
+        arr.setflags(write=False)
+    return calendar
+
+
+EVENT_RECORDER_CHUNKSIZE = 500000
+
+
+def read_event_recorder(
+    source,
+    usecols=None,
+    event_names=None,
+    time_cutoff=None,
+    chunksize=EVENT_RECORDER_CHUNKSIZE,
+):
+    """
+    Read a ReportEventRecorder.csv in chunks, parsing only the requested
+    columns and keeping only the rows that pass the filters, so rows that
+    would be dropped later are never held in one frame.
+
+    Args:
+        source: raw file content (bytes), path or file-like object
+        usecols: columns to parse (all if None)
+        event_names: keep only these values of Event_Name (all if None)
+        time_cutoff: keep only rows with Time >= time_cutoff (all if None)
+        chunksize: number of rows parsed at a time
+
+    Returns:
+        DataFrame
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if isinstance(event_names, str):
+        event_names = [event_names]
+
+    chunks = []
+    for chunk in pd.read_csv(source, usecols=usecols, chunksize=chunksize):
+        if time_cutoff is not None:
+            chunk = chunk[chunk["Time"] >= time_cutoff]
+        if event_names is not None:
+            chunk = chunk[chunk["Event_Name"].isin(event_names)]
+        chunks.append(chunk)
+
+    if not chunks:
+        return pd.DataFrame(columns=usecols)
+    return pd.concat(chunks, ignore_index=True)
+
+
+class ReportCache:
+    """
+    Per-process cache of the parsed output files of the simulation being
+    mapped, so analyzers run by the same AnalyzeManager read and parse each
+    file only once per simulation. The analyzers of a run map one simulation
+    after the other in a worker, so the cache is emptied as soon as a file of
+    another simulation is asked for, and never holds more than the files of
+    one simulation. Entries are keyed by (filename, file size, parse key).
+
+    Hits and misses are counted per analyzer (owner).
+    """
+
+    def __init__(self):
+        self._simulation = None
+        self._entries = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, simulation_id, key, load, owner=None):
+        with self._lock:
+            counts = self._counts.setdefault(owner, [0, 0])
+            if simulation_id != self._simulation:
+                self._entries.clear()
+                self._simulation = simulation_id
+            if key in self._entries:
+                counts[0] += 1
+                return self._entries[key]
+
+        value = load()
+        with self._lock:
+            counts[1] += 1
+            if simulation_id == self._simulation:
+                self._entries.setdefault(key, value)
+        return value
+
+    def stats(self, owner=None):
+        hits, misses = self._counts.get(owner, [0, 0])
+        return {"pid": os.getpid(), "hits": hits, "misses": misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._simulation = None
+
+
+REPORT_CACHE = ReportCache()
+
+
+def summarize_cache_stats(stats):
+    """
+    Combine the report cache counters returned by the map calls of one
+    analyzer. Counters are cumulative per worker process, so only the last
+    value seen for each process is kept.
+    """
+    per_pid = {}
+    for s in stats:
+        last = per_pid.get(s["pid"])
+        if last is None or s["hits"] + s["misses"] > last["hits"] + last["misses"]:
+            per_pid[s["pid"]] = s
+    hits = sum(s["hits"] for s in per_pid.values())
+    misses = sum(s["misses"] for s in per_pid.values())
+
+    return hits, misses
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident memory of the calling process in MB, or NaN where the
+    resource module is not available. With children=True, the peak of its
+    largest terminated child process counts too (e.g. analyze workers).
+    """
+    if resource is None:
+        return np.nan
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return peak * unit / 1024**2
+
+
+class OutputIndex:
+    """
+    Per-process index of the files present in the simulation directories of
+    each experiment. A directory (e.g. output/) is listed for all simulations
+    of an experiment at once, with one os.scandir per simulation across a
+    thread pool, the first time any analyzer asks about it. Analyzers with
+    filter_exists="index" then check their files against the index instead of
+    calling os.path.exists per file.
+
+    LocalAnalyzeManager builds the index before mapping and hands it to its
+    workers. With the idmtools AnalyzeManager call
+    local_analyze.build_output_index before analyze(), otherwise every
+    worker process lists the experiment on its own.
+    """
+
+    def __init__(self, max_workers=32):
+        self.max_workers = max_workers
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def listing(self, experiment_dir, subdir):
+        """
+        Names of the files in subdir of every simulation of experiment_dir,
+        as {simulation directory name: frozenset of names}.
+        """
+        key = (experiment_dir, subdir)
+        with self._lock:
+            if key not in self._listings:
+                self._listings[key] = self._scan(experiment_dir, subdir)
+            return self._listings[key]
+
+    def _scan(self, experiment_dir, subdir):
+        with os.scandir(experiment_dir) as it:
+            simulations = [e.name for e in it if e.is_dir()]
+
+        def list_names(simulation):
+            try:
+                with os.scandir(os.path.join(experiment_dir, simulation, subdir)) as it:
+                    return simulation, frozenset(e.name for e in it)
+            except (FileNotFoundError, NotADirectoryError):
+                return simulation, frozenset()
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            return dict(executor.map(list_names, simulations))
+
+    def exists(self, simulation_dir, filename):
+        experiment_dir, simulation = os.path.split(os.path.normpath(simulation_dir))
+        subdir, name = os.path.split(os.path.normpath(filename))
+        names = self.listing(experiment_dir, subdir).get(simulation)
+        if names is None:  # created after the index was built
+            return os.path.exists(os.path.join(simulation_dir, filename))
+        return name in names
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._listings)
+
+    def update(self, listings):
+        with self._lock:
+            self._listings.update(listings)
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
 
-class MonthlyAgebinPfPRAnalyzer(IAnalyzer):
+OUTPUT_INDEX = OutputIndex()
+
+
+ShardRef = namedtuple("ShardRef", ["path", "offset", "length", "columns", "attrs"])
+
+
+def write_shard(df, spill_dir, prefix):
+    """
+    Append a map result to the shard file of the calling worker and return a
+    reference to it.
+    """
+    path = os.path.join(
+        spill_dir, f"{prefix}.{os.getpid()}_{threading.get_ident()}.shard"
+    )
+    with open(path, "ab") as f:
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        length = f.tell() - offset
+
+    return ShardRef(path, offset, length, list(df.columns), dict(df.attrs))
+
+
+def read_shard(ref):
+    with open(ref.path, "rb") as f:
+        f.seek(ref.offset)
+        return pickle.loads(f.read(ref.length))
+
+
+def write_parquet_dataset(
+    adf, path, partition_cols=None, overwrite=True, basename_template=None
+):
+    """
+    Write a frame as a hive-partitioned Parquet dataset, with string columns
+    dictionary-encoded and floating point measures stored as float32.
+
+    Args:
+        adf: frame to write
+        path: dataset root directory, replaced if it already exists
+        partition_cols: columns to partition on; those absent from adf are
+            skipped
+        overwrite: remove an existing dataset at path first
+        basename_template: file name template for the written fragments, to
+            append several chunks to the same dataset
+
+    Returns:
+        None
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    partition_cols = [c for c in partition_cols or [] if c in adf.columns]
+    table = pa.Table.from_pandas(adf, preserve_index=False)
+
+    fields = []
+    for field in table.schema:
+        dtype = field.type
+        if pa.types.is_dictionary(dtype) and not pa.types.is_string(dtype.value_type):
+            dtype = dtype.value_type
+        if field.name in partition_cols:
+            if pa.types.is_dictionary(dtype):
+                dtype = dtype.value_type
+        elif pa.types.is_floating(dtype):
+            dtype = pa.float32()
+        elif (
+            pa.types.is_dictionary(dtype)
+            or pa.types.is_string(dtype)
+            or pa.types.is_large_string(dtype)
+        ):
+            dtype = pa.dictionary(pa.int32(), pa.string())
+        fields.append(pa.field(field.name, dtype))
+    table = table.cast(pa.schema(fields))
+
+    if overwrite and os.path.exists(path):
+        shutil.rmtree(path)
+    pq.write_to_dataset(
+        table,
+        path,
+        partition_cols=partition_cols or None,
+        basename_template=basename_template,
+    )
+
+
+def count_by_year_and_agebin(time, age, agebins, start_year=0, cumulative=True):
+    """
+    Count events per simulation year and age bin in a single pass.
+
+    Args:
+        time: event times in days
+        age: ages at event in years
+        agebins: upper edges of the age bins, in output order
+        start_year: calendar year of simulation day 0
+        cumulative: count ages in (0, agemax) for each bin if True, otherwise
+            between the next lower edge (or 0) and agemax
+
+    Returns:
+        (years, counts) with counts of shape (len(years), len(agebins))
+    """
+    edges = np.unique(agebins)
+    year = np.floor(np.asarray(time) / 365).astype(np.int64) + start_year
+    age = np.asarray(age)
+    bin_idx = np.searchsorted(edges, age, side="right")
+    keep = (age > 0) & (bin_idx < len(edges))
+    year, bin_idx = year[keep], bin_idx[keep]
+
+    if len(year) == 0:
+        return np.array([], dtype=np.int64), np.zeros((0, len(agebins)), np.int64)
+
+    first_year = year.min()
+    n_years = year.max() - first_year + 1
+    counts = np.bincount(
+        (year - first_year) * len(edges) + bin_idx, minlength=n_years * len(edges)
+    ).reshape(n_years, len(edges))
+    if cumulative:
+        counts = counts.cumsum(axis=1)
+
+    years = np.arange(first_year, first_year + n_years)
+    return years, counts[:, np.searchsorted(edges, agebins)]
+
+
+class BaseOutputAnalyzer(IAnalyzer):
+    """
+    Common reduce for the analyzers in this collection: stack the map outputs
+    of all simulations and save them as ``output_name``.
+
+    With output_format="csv" (default) a single CSV file is written. With
+    output_format="parquet" a Parquet dataset directory is written instead,
+    partitioned by partition_cols (default DS_Name, e.g. ["DS_Name", "year"]
+    to also split by year), so downstream scripts can read only the DS and
+    years they need.
+
+    With streaming=True each map result is spilled to a per-worker shard file
+    in spill_dir as soon as it is produced, and reduce assembles the output
+    from the shards in chunks of at most max_memory_mb, so memory use no
+    longer grows with the size of the experiment.
+
+    Analyzers that read their files through load_file share each parsed file
+    with the other analyzers of the run via REPORT_CACHE (share_reports=True,
+    default). Cache hits and misses are printed at the end of reduce. The
+    event recorder analyzers share the recorder read with the columns they
+    use, and select their events on it.
+
+    With incremental=True the map result of every simulation is kept in an
+    analysis ledger next to the output, along with the size and mtime of the
+    simulation's output files and the analyzer parameters. A later run only
+    maps simulations that are new or whose outputs changed, and rebuilds the
+    output from the ledger.
+
+    With instrument=True the wall time of filter, file loading and map, the
+    bytes read of the analyzer's files, the rows produced and how much the
+    simulation raised the peak RSS of the worker are recorded for every
+    simulation. At the end of reduce their p50/p95/max and the slowest_n
+    simulations are printed and saved as ``output_name``_metrics.json, with
+    the peak RSS of each worker process.
+
+    Analyzers with an output_schema cast their map outputs to its compact
+    dtypes (see OUTPUT_SCHEMA), so reduce and the parquet outputs stay small.
+    compact_dtypes=False keeps the dtypes produced by select_simulation_data.
+
+    With filter_exists=True simulations missing any of the filenames are
+    skipped, checking each file with os.path.exists. filter_exists="index"
+    checks them against OUTPUT_INDEX instead, which lists the simulation
+    directories of each experiment in bulk once per process and is shared by
+    all analyzers.
+
+    Subclasses implement select_simulation_data(data, simulation).
+    """
+
+    output_name = None
+    output_schema = None
+
+    # Per-simulation measures summarized by save_metrics
+    metric_names = [
+        "filter_s",
+        "load_s",
+        "map_s",
+        "bytes_read",
+        "rows",
+        "rss_growth_mb",
+    ]
+
+    # Attributes that do not change what the analyzer outputs
+    runtime_attrs = (
+        "uid",
+        "working_dir",
+        "parse",
+        "output_format",
+        "partition_cols",
+        "streaming",
+        "spill_dir",
+        "max_memory_mb",
+        "share_reports",
+        "incremental",
+        "filter_exists",
+        "instrument",
+        "slowest_n",
+    )
+
+    def __init__(
+        self,
+        working_dir="./",
+        filenames=None,
+        output_format="csv",
+        partition_cols=None,
+        streaming=False,
+        spill_dir=None,
+        max_memory_mb=1024,
+        share_reports=True,
+        incremental=False,
+        instrument=False,
+        slowest_n=10,
+        compact_dtypes=True,
+        **kwargs,
+    ):
+        super(BaseOutputAnalyzer, self).__init__(
+            working_dir=working_dir, filenames=filenames, **kwargs
+        )
+        self.filter_exists = False
+        if output_format not in ("csv", "parquet"):
+            raise ValueError(
+                f"output_format must be 'csv' or 'parquet', got {output_format!r}"
+            )
+        self.output_format = output_format
+        self.partition_cols = partition_cols or ["DS_Name"]
+        self.streaming = streaming
+        self.spill_dir = spill_dir or os.path.join(
+            working_dir, f"_{self.output_name}_shards"
+        )
+        self.max_memory_mb = max_memory_mb
+        self.share_reports = share_reports
+        self.incremental = incremental
+        self.instrument = instrument
+        self.slowest_n = slowest_n
+        self.compact_dtypes = compact_dtypes
+        self._ledger = None
+        self._sim_metrics = {}
+
+    def output_path(self):
+        ext = "csv" if self.output_format == "csv" else "parquet"
+        return os.path.join(self.working_dir, f"{self.output_name}.{ext}")
+
+    def ledger_dir(self):
+        return os.path.join(self.working_dir, f"_{self.output_name}_ledger")
+
+    def analyzer_params(self):
+        """
+        Parameters that determine the analyzer output, as a JSON-compatible
+        dict.
+        """
+        params = {}
+        for k, v in sorted(vars(self).items()):
+            if k.startswith("_") or k in self.runtime_attrs:
+                continue
+            try:
+                # As read back from the ledger, e.g. tuples as lists
+                v = json.loads(json.dumps(v))
+            except TypeError:
+                v = repr(v)
+            params[k] = v
+        return params
+
+    def output_fingerprint(self, simulation: Simulation):
+        fingerprint = {}
+        for f in self.filenames:
+            try:
+                st = os.stat(os.path.join(simulation.get_path(), f))
+                fingerprint[f] = [st.st_size, st.st_mtime_ns]
+            except OSError:
+                fingerprint[f] = None
+        return fingerprint
+
+    def load_ledger(self):
+        """
+        Load the analysis ledger, or start an empty one if there is none or it
+        was written with different analyzer parameters.
+        """
+        ledger = {"params": self.analyzer_params(), "simulations": {}}
+        path = os.path.join(self.ledger_dir(), "ledger.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                previous = json.load(f)
+            if previous["params"] == ledger["params"]:
+                ledger = previous
+        return ledger
+
+    def save_ledger(self, ledger):
+        path = os.path.join(self.ledger_dir(), "ledger.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(ledger, f)
+        os.replace(path + ".tmp", path)
+
+    def is_up_to_date(self, simulation: Simulation):
+        if self._ledger is None:
+            self._ledger = self.load_ledger()
+        entry = self._ledger["simulations"].get(str(simulation.id))
+
+        return (
+            entry is not None
+            and os.path.exists(os.path.join(self.ledger_dir(), entry["result"]))
+            and entry["files"] == self.output_fingerprint(simulation)
+        )
+
+    def filter(self, simulation: Simulation):
+        if not self.instrument:
+            return self._filter(simulation)
+
+        t0 = time.perf_counter()
+        selected = self._filter(simulation)
+        if selected:
+            self._sim_metrics[simulation.id] = {
+                "filter_s": time.perf_counter() - t0,
+                "load_s": 0.0,
+            }
+        return selected
+
+    def _filter(self, simulation: Simulation):
+        if self.incremental and self.is_up_to_date(simulation):
+            return False
+        if self.filter_exists == "index":
+            return all(
+                OUTPUT_INDEX.exists(simulation.get_path(), f) for f in self.filenames
+            )
+        if self.filter_exists:
+            return all(
+                os.path.exists(os.path.join(simulation.get_path(), f))
+                for f in self.filenames
+            )
+        return True
+
+    def select_simulation_data(self, data, simulation: Simulation):
+        raise NotImplementedError
+
+    def load_file(self, data, filename, simulation: Simulation, parse=None, key=None):
+        """
+        Parse a raw output file, or return the copy already parsed for this
+        simulation by another analyzer.
+
+        Args:
+            data: map data
+            filename: output file to load
+            simulation: simulation the data belongs to
+            parse: function turning the raw content into the parsed object
+                (JSON by default)
+            key: identifies the parse, so only analyzers parsing the file the
+                same way share it
+
+        Returns:
+            parsed file content, which other analyzers may share and must not
+            be modified
+        """
+        content = data[filename]
+        if not isinstance(content, (bytes, bytearray)):
+            return content  # already parsed by idmtools
+
+        parse = parse or json.loads
+        if self.instrument:
+            t0 = time.perf_counter()
+        if not self.share_reports:
+            value = parse(content)
+        else:
+            value = REPORT_CACHE.get(
+                simulation.id,
+                (filename, len(content), key),
+                lambda: parse(content),
+                owner=self.uid,
+            )
+        if self.instrument:
+            m = self._sim_metrics.setdefault(simulation.id, {"load_s": 0.0})
+            m["load_s"] += time.perf_counter() - t0
+        return value
+
+    def load_event_recorder(self, data, filename, simulation: Simulation, usecols):
+        """
+        Load a ReportEventRecorder with only usecols (all if None), through
+        load_file, so the analyzers of a run that read the same columns, e.g.
+        annualSevereTreatedByAgeAnalyzer for several events, parse it once.
+        Each analyzer then selects its events and times on the shared frame.
+        """
+        return self.load_file(
+            data,
+            filename,
+            simulation,
+            parse=functools.partial(read_event_recorder, usecols=usecols),
+            key=("event_recorder", tuple(sorted(usecols)) if usecols else None),
+        )
+
+    def map(self, data, simulation: Simulation):
+        if self.instrument:
+            t0 = time.perf_counter()
+            rss0 = peak_rss_mb()
+        df = self.select_simulation_data(data, simulation)
+        if self.compact_dtypes and self.output_schema:
+            df = apply_output_schema(df, self.output_schema)
+        if self.instrument:
+            m = self._sim_metrics.pop(simulation.id, {})
+            df.attrs["metrics"] = {
+                "simulation": str(simulation.id),
+                "filter_s": m.get("filter_s", np.nan),
+                "load_s": m.get("load_s", 0.0),
+                "map_s": time.perf_counter() - t0,
+                # data may also hold the files of other analyzers
+                "bytes_read": sum(
+                    len(data[f])
+                    for f in self.filenames
+                    if isinstance(data.get(f), (bytes, bytearray))
+                ),
+                "rows": len(df),
+                # How much this simulation raised the worker's peak memory
+                "rss_growth_mb": peak_rss_mb() - rss0,
+                "pid": os.getpid(),
+                "worker_peak_rss_mb": peak_rss_mb(),
+            }
+        if self.share_reports:
+            df.attrs["report_cache"] = REPORT_CACHE.stats(self.uid)
+        if self.streaming:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            return write_shard(df, self.spill_dir, self.output_name)
+
+        return df
+
+    def save_output(self, adf, part=0):
+        """
+        Save the stacked outputs. part > 0 appends a further chunk of rows to
+        the output written by the previous parts.
+        """
+        if self.output_format == "parquet":
+            write_parquet_dataset(
+                adf,
+                self.output_path(),
+                self.partition_cols,
+                overwrite=part == 0,
+                basename_template=f"part-{part}-{{i}}.parquet",
+            )
+        else:
+            adf.to_csv(
+                self.output_path(),
+                index=False,
+                mode="w" if part == 0 else "a",
+                header=part == 0,
+            )
+
+    def reduce(self, all_data):
+        t0 = time.perf_counter()
+        self._reduce(all_data)
+        if self.instrument:
+            self.save_metrics(all_data.values(), time.perf_counter() - t0)
+
+    def _reduce(self, all_data):
+        if self.incremental:
+            self._reduce_incremental(all_data)
+            return
+
+        selected = [data for sim, data in all_data.items()]
+        if len(selected) == 0:
+            print("\nWarning: No data have been returned... Exiting...")
+            return
+
+        print(f"\nSaving outputs to: {self.working_dir}")
+
+        self._print_cache_stats(selected)
+
+        if self.streaming:
+            self._reduce_shards(selected)
+            return
+
+        adf = concat_frames(selected).reset_index(drop=True)
+        self.save_output(adf)
+
+    def metrics_path(self):
+        return os.path.join(self.working_dir, f"{self.output_name}_metrics.json")
+
+    def save_metrics(self, selected, reduce_s):
+        """
+        Summarize the per-simulation metrics recorded by map and save them
+        with the reduce time.
+        """
+        mdf = pd.DataFrame(
+            [x.attrs["metrics"] for x in selected if "metrics" in x.attrs],
+            columns=["simulation"] + self.metric_names + ["pid", "worker_peak_rss_mb"],
+        )
+        # Peak memory is per process, so it is reported once per worker
+        worker_peaks = mdf.groupby("pid")["worker_peak_rss_mb"].max()
+        summary = {
+            "analyzer": self.uid,
+            "n_simulations": len(mdf),
+            "reduce_s": reduce_s,
+            "total": {
+                "map_s": float(mdf["map_s"].sum()),
+                "bytes_read": int(mdf["bytes_read"].sum()),
+                "rows": int(mdf["rows"].sum()),
+            },
+            "worker_peak_rss_mb": {str(k): v for k, v in worker_peaks.items()},
+            "percentiles": {},
+            "slowest": [],
+        }
+        if len(mdf) > 0:
+            for m in self.metric_names:
+                values = mdf[m].dropna().to_numpy(dtype=float)
+                if len(values) == 0:
+                    continue
+                p50, p95 = np.percentile(values, [50, 95])
+                summary["percentiles"][m] = {
+                    "p50": p50,
+                    "p95": p95,
+                    "max": values.max(),
+                }
+            slowest = mdf.nlargest(self.slowest_n, "map_s")[
+                ["simulation"] + self.metric_names
+            ]
+            summary["slowest"] = json.loads(slowest.to_json(orient="records"))
+
+        os.makedirs(self.working_dir, exist_ok=True)
+        with open(self.metrics_path(), "w") as f:
+            json.dump(summary, f, indent=2, default=float)
+
+        map_s = summary["percentiles"].get("map_s", {})
+        print(
+            f"{self.uid}: map p50 {map_s.get('p50', np.nan):.3f}s, "
+            f"p95 {map_s.get('p95', np.nan):.3f}s, "
+            f"max {map_s.get('max', np.nan):.3f}s over {len(mdf)} simulations; "
+            f"reduce {reduce_s:.1f}s. Metrics saved to {self.metrics_path()}"
+        )
+
+    def _print_cache_stats(self, selected):
+        if self.share_reports:
+            attrs = [x.attrs for x in selected]
+            hits, misses = summarize_cache_stats(
+                a["report_cache"] for a in attrs if "report_cache" in a
+            )
+            print(f"Report cache for {self.uid}: {hits} hits, {misses} misses")
+
+    def _reduce_incremental(self, all_data):
+        ledger = self.load_ledger()
+        simulations = ledger["simulations"]
+        os.makedirs(self.ledger_dir(), exist_ok=True)
+        for sim, data in all_data.items():
+            df = read_shard(data) if isinstance(data, ShardRef) else data
+            result = f"{sim.id}.pkl"
+            with open(os.path.join(self.ledger_dir(), result), "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            simulations[str(sim.id)] = {
+                "path": str(sim.get_path()),
+                "files": self.output_fingerprint(sim),
+                "result": result,
+                "columns": list(df.columns),
+            }
+        if self.streaming:
+            self._remove_shards(all_data.values())
+
+        # Forget simulations that no longer exist
+        removed = [k for k, v in simulations.items() if not os.path.isdir(v["path"])]
+        for sim_id in removed:
+            entry = simulations.pop(sim_id)
+            os.remove(os.path.join(self.ledger_dir(), entry["result"]))
+        self.save_ledger(ledger)
+
+        print(
+            f"\n{self.uid}: {len(all_data)} new or changed simulations, "
+            f"{len(simulations)} in the analysis ledger"
+        )
+        if len(simulations) == 0:
+            print("\nWarning: No data have been returned... Exiting...")
+            return
+        if not all_data and not removed and os.path.exists(self.output_path()):
+            print(f"Outputs in {self.working_dir} are up to date")
+            return
+
+        print(f"\nSaving outputs to: {self.working_dir}")
+        self._print_cache_stats(all_data.values())
+        refs = []
+        for entry in simulations.values():
+            path = os.path.join(self.ledger_dir(), entry["result"])
+            refs.append(ShardRef(path, 0, os.path.getsize(path), entry["columns"], {}))
+        self._reduce_shards(refs, remove=False)
+
+    def _reduce_shards(self, refs, remove=True):
+        # Align every chunk on the union of columns, as pd.concat would
+        columns = list(dict.fromkeys(c for ref in refs for c in ref.columns))
+        limit = self.max_memory_mb * 1024**2
+
+        buffer, buffered, part = [], 0, 0
+        for ref in refs:
+            df = read_shard(ref)
+            buffer.append(df)
+            buffered += df.memory_usage(deep=True).sum()
+            if buffered >= limit:
+                self.save_output(concat_frames(buffer).reindex(columns=columns), part)
+                buffer, buffered, part = [], 0, part + 1
+        if buffer:
+            self.save_output(concat_frames(buffer).reindex(columns=columns), part)
+
+        if remove:
+            self._remove_shards(refs)
+
+    def _remove_shards(self, refs):
+        for path in set(ref.path for ref in refs):
+            os.remove(path)
+        if os.path.isdir(self.spill_dir) and not os.listdir(self.spill_dir):
+            os.rmdir(self.spill_dir)
+
+
+class MonthlyAgebinPfPRAnalyzer(BaseOutputAnalyzer):
     """
     Take monthly MalariaSummaryReport and pull out the PfPR, Cases, Severe Cases
     and Population for each agebins.
     """
 
+    output_name = "Agebin_PfPR_ClinicalIncidence_monthly"
+    output_schema = OUTPUT_SCHEMA
+
     def __init__(
         self,
         sweep_variables=None,
@@ -19,6 +1005,7 @@ class MonthlyAgebinPfPRAnalyzer(IAnalyzer):
         start_year=2000,
         end_year=2001,
         filter_exists=False,
+        **kwargs,
     ):
         super(MonthlyAgebinPfPRAnalyzer, self).__init__(
             working_dir=working_dir,
@@ -26,6 +1013,8 @@ class MonthlyAgebinPfPRAnalyzer(IAnalyzer):
                 f"output/MalariaSummaryReport_Monthly{x}.json"
                 for x in range(start_year, end_year)
             ],
+            parse=False,
+            **kwargs,
         )
 
         self.sweep_variables = sweep_variables or ["Run_Number"]
@@ -33,50 +1022,25 @@ class MonthlyAgebinPfPRAnalyzer(IAnalyzer):
         self.end_year = end_year
         self.filter_exists = filter_exists
 
-    def filter(self, simulation: Simulation):
-        if self.filter_exists:
-            file = os.path.join(simulation.get_path(), self.filenames[0])
-            return os.path.exists(file)
-        else:
-            return True
-
-    def map(self, data, simulation: Simulation):
-        adf = []
-        fname = self.filenames[0]
-
-        for year, fname in zip(range(self.start_year, self.end_year), self.filenames):
-            age_bins = data[fname]["Metadata"]["Age Bins"]
-            df = pd.DataFrame.from_dict(
-                data[fname]["DataByTimeAndAgeBins"], orient="columns"
-            )[:-1]
-            df["month"] = [[x] * len(age_bins) for x in range(1, len(df) + 1)]
-            df["agebin"] = [age_bins] * len(df)
-            df.rename(
-                columns={
-                    "PfPR by Age Bin": "PfPR",
-                    "Annual Clinical Incidence by Age Bin": "Cases",
-                    "Annual Severe Incidence by Age Bin": "Severe cases",
-                    "New Infections by Age Bin": "New infections",
-                    "Average Population by Age Bin": "Pop",
-                },
-                inplace=True,
+    def select_simulation_data(self, data, simulation: Simulation):
+        arrs, n_months = [], []
+        for fname in self.filenames:
+            report = self.load_file(
+                data, fname, simulation, parse=read_agebin_report, key="agebin"
             )
-            df = df[
-                [
-                    "agebin",
-                    "month",
-                    "PfPR",
-                    "Cases",
-                    "Severe cases",
-                    "New infections",
-                    "Pop",
-                ]
-            ]
-            df = df.explode(list(df.columns))
-            df["year"] = year
-            adf = adf + [df]
-
-        adf = pd.concat(adf)
+            # The last time step of each report spills over into the next year
+            n_times = len(report["DataByTimeAndAgeBins"]["PfPR by Age Bin"]) - 1
+            age_bins, arr = decode_agebin_channels(report, n_times=n_times)
+            arrs.append(arr)
+            n_months.append(n_times)
+
+        # Months and years per report, in case the reports differ in length
+        months = np.concatenate([np.arange(1, n + 1) for n in n_months])
+        adf = agebin_long_frame(age_bins, np.concatenate(arrs), "month", months)
+        adf["year"] = np.repeat(
+            np.arange(self.start_year, self.end_year),
+            np.array(n_months) * len(age_bins),
+        )
 
         for sweep_var in self.sweep_variables:
             if sweep_var in simulation.tags.keys():
@@ -84,32 +1048,15 @@ class MonthlyAgebinPfPRAnalyzer(IAnalyzer):
 
         return adf
 
-    def reduce(self, all_data):
-        selected = [data for sim, data in all_data.items()]
-        if len(selected) == 0:
-            print("\nWarning: No data have been returned... Exiting...")
-            return
-
-        print(f"\nSaving outputs to: {self.working_dir}")
-
-        adf = pd.concat(selected).reset_index(drop=True)
-        adf.to_csv(
-            (
-                os.path.join(
-                    self.working_dir,
-                    "Agebin_PfPR_ClinicalIncidence_monthly.csv",
-                )
-            ),
-            index=False,
-        )
-
 
-class MonthlyTreatedCasesAnalyzer(IAnalyzer):
+class MonthlyTreatedCasesAnalyzer(BaseOutputAnalyzer):
     """
     Take monthly ReportEventCounter and ReportMalariaFiltered and pull out the
     cases and treated cases for all age.
     """
 
+    output_name = "All_Age_Monthly_Cases"
+
     def __init__(
         self,
         sweep_variables,
@@ -118,6 +1065,7 @@ class MonthlyTreatedCasesAnalyzer(IAnalyzer):
         start_year=2000,
         end_year=2001,
         filter_exists=False,
+        **kwargs,
     ):
         super(MonthlyTreatedCasesAnalyzer, self).__init__(
             working_dir=working_dir,
@@ -125,6 +1073,8 @@ class MonthlyTreatedCasesAnalyzer(IAnalyzer):
                 "output/ReportEventCounter.json",
                 "output/ReportMalariaFiltered.json",
             ],
+            parse=False,
+            **kwargs,
         )
 
         self.sweep_variables = sweep_variables
@@ -143,44 +1093,15 @@ class MonthlyTreatedCasesAnalyzer(IAnalyzer):
         self.end_year = end_year
         self.filter_exists = filter_exists
 
-    def filter(self, simulation: Simulation):
-        if self.filter_exists:
-            x = [
-                os.path.exists(os.path.join(simulation.get_path(), f))
-                for f in self.filenames
-            ]
-            return all(x)
-        else:
-            return True
-
-    def map(self, data, simulation: Simulation):
-        simdata = pd.DataFrame(
-            {
-                x: data[self.filenames[1]]["Channels"][x]["Data"]
-                for x in self.inset_channels
-            }
-        )
-        simdata["Time"] = simdata.index
-
+    def select_simulation_data(self, data, simulation: Simulation):
+        inset = self.load_file(data, self.filenames[1], simulation)
+        channels = {x: inset["Channels"][x]["Data"] for x in self.inset_channels}
         if self.channels:
-            d = pd.DataFrame(
-                {
-                    x: data[self.filenames[0]]["Channels"][x]["Data"]
-                    for x in self.channels
-                }
+            counter = self.load_file(data, self.filenames[0], simulation)
+            channels.update(
+                {x: counter["Channels"][x]["Data"] for x in self.channels}
             )
-            d["Time"] = d.index
-            simdata = pd.merge(left=simdata, right=d, on="Time")
-
-        simdata["Day"] = simdata["Time"] % 365
-        simdata["Month"] = (simdata["Time"] % 365 - 1) // 30 + 1
-        simdata["Year"] = simdata["Time"].apply(
-            lambda x: int(x / 365) + self.start_year
-        )
-        simdata = simdata[simdata["Month"].isin(list(range(1, 13)))]
-        simdata["date"] = simdata.apply(
-            lambda x: datetime.date(int(x["Year"]), int(x["Month"]), 1), axis=1
-        )
+        n_days = min(len(v) for v in channels.values())
 
         sum_channels = [
             "Received_Treatment",
@@ -189,45 +1110,38 @@ class MonthlyTreatedCasesAnalyzer(IAnalyzer):
             "New Severe Cases",
             "Received_NMF_Treatment",
         ]
-        for x in [y for y in sum_channels if y not in simdata.columns.values]:
-            simdata[x] = 0
         mean_channels = ["Statistical Population", "PfHRP2 Prevalence"]
 
-        df = simdata.groupby(["date"])[sum_channels].agg(np.sum).reset_index()
-        pdf = simdata.groupby(["date"])[mean_channels].agg(np.mean).reset_index()
-
-        simdata = pd.merge(left=pdf, right=df, on=["date"])
+        calendar = emod_calendar(self.start_year, n_days)
+        simdata = pd.DataFrame({"date": calendar.dates})
+        if len(calendar.starts) > 0:
+            days_per_month = np.diff(np.append(calendar.starts, calendar.valid.sum()))
+            for x in mean_channels + sum_channels:
+                if x not in channels:
+                    simdata[x] = 0
+                    continue
+                values = np.asarray(channels[x][:n_days], dtype=np.float64)
+                total = np.add.reduceat(values[calendar.valid], calendar.starts)
+                simdata[x] = total / days_per_month if x in mean_channels else total
+        else:
+            for x in mean_channels + sum_channels:
+                simdata[x] = []
 
         for sweep_var in self.sweep_variables:
             if sweep_var in simulation.tags.keys():
                 simdata[sweep_var] = simulation.tags[sweep_var]
         return simdata
 
-    def reduce(self, all_data):
-        selected = [data for sim, data in all_data.items()]
-        if len(selected) == 0:
-            print("\nWarning: No data have been returned... Exiting...")
-            return
-
-        print(f"\nSaving outputs to: {self.working_dir}")
 
-        adf = pd.concat(selected).reset_index(drop=True)
-        adf.to_csv(
-            (
-                os.path.join(
-                    self.working_dir, "All_Age_Monthly_Cases.csv"
-                )
-            ),
-            index=False,
-        )
-
-
-class AnnualAgebinPfPRAnalyzer(IAnalyzer):
+class AnnualAgebinPfPRAnalyzer(BaseOutputAnalyzer):
     """
     Take monthly MalariaSummaryReport and pull out the PfPR, Cases, Severe Cases
     and Population for each agebins.
     """
 
+    output_name = "Agebin_PfPR_ClinicalIncidence_annual"
+    output_schema = OUTPUT_SCHEMA
+
     def __init__(
         self,
         sweep_variables=None,
@@ -235,12 +1149,15 @@ class AnnualAgebinPfPRAnalyzer(IAnalyzer):
         start_year=2000,
         end_year=2001,
         filter_exists=False,
+        **kwargs,
     ):
         super(AnnualAgebinPfPRAnalyzer, self).__init__(
             working_dir=working_dir,
             filenames=[
                 f"output/MalariaSummaryReport_Annual_{start_year}to{end_year}.json"
             ],
+            parse=False,
+            **kwargs,
         )
 
         self.sweep_variables = sweep_variables or ["Run_Number"]
@@ -248,38 +1165,17 @@ class AnnualAgebinPfPRAnalyzer(IAnalyzer):
         self.end_year = end_year
         self.filter_exists = filter_exists
 
-    def filter(self, simulation: Simulation):
-        if self.filter_exists:
-            file = os.path.join(simulation.get_path(), self.filenames[0])
-            return os.path.exists(file)
-        else:
-            return True
-
-    def map(self, data, simulation: Simulation):
-        fname = self.filenames[0]
-
-        age_bins = data[fname]["Metadata"]["Age Bins"]
-        df = pd.DataFrame.from_dict(
-            data[fname]["DataByTimeAndAgeBins"], orient="columns"
+    def select_simulation_data(self, data, simulation: Simulation):
+        report = self.load_file(
+            data, self.filenames[0], simulation, parse=read_agebin_report, key="agebin"
         )
-        df["year"] = [
-            [x] * len(age_bins) for x in range(self.start_year, self.end_year + 1)
-        ]
-        df["agebin"] = [age_bins] * len(df)
-        df.rename(
-            columns={
-                "PfPR by Age Bin": "PfPR",
-                "Annual Clinical Incidence by Age Bin": "Cases",
-                "Annual Severe Incidence by Age Bin": "Severe cases",
-                "New Infections by Age Bin": "New infections",
-                "Average Population by Age Bin": "Pop",
-            },
-            inplace=True,
+        age_bins, arr = decode_agebin_channels(report)
+        df = agebin_long_frame(
+            age_bins,
+            arr,
+            "year",
+            np.arange(self.start_year, self.end_year + 1),
         )
-        df = df[
-            ["agebin", "year", "PfPR", "Cases", "Severe cases", "New infections", "Pop"]
-        ]
-        df = df.explode(list(df.columns))
 
         for sweep_var in self.sweep_variables:
             if sweep_var in simulation.tags.keys():
@@ -287,32 +1183,19 @@ class AnnualAgebinPfPRAnalyzer(IAnalyzer):
 
         return df
 
-    def reduce(self, all_data):
-        selected = [data for sim, data in all_data.items()]
-        if len(selected) == 0:
-            print("\nWarning: No data have been returned... Exiting...")
-            return
-
-        print(f"\nSaving outputs to: {self.working_dir}")
-
-        adf = pd.concat(selected).reset_index(drop=True)
-        adf.to_csv(
-            (
-                os.path.join(
-                    self.working_dir,
-                    "Agebin_PfPR_ClinicalIncidence_annual.csv",
-                )
-            ),
-            index=False,
-        )
-
 
-class annualSevereTreatedByAgeAnalyzer(IAnalyzer):
+class annualSevereTreatedByAgeAnalyzer(BaseOutputAnalyzer):
     """
     Take monthly ReportEventCounter and ReportMalariaFiltered and pull out the
     cases and treated cases for all age.
+
+    With agebin_type="cumulative" (default) each entry of agebins counts the
+    events at ages (0, agemax); with "disjoint" it counts the events between
+    the previous bin edge and agemax.
     """
 
+    output_name = "Treated_Severe_Yearly_Cases_By_Age"
+
     def __init__(
         self,
         event_name="Received_Severe_Treatment",
@@ -322,57 +1205,57 @@ class annualSevereTreatedByAgeAnalyzer(IAnalyzer):
         start_year=2000,
         ds_col="DS_Name",
         filter_exists=False,
+        agebin_type="cumulative",
+        **kwargs,
     ):
         super(annualSevereTreatedByAgeAnalyzer, self).__init__(
             working_dir=working_dir,
             filenames=[
                 "output/ReportEventRecorder.csv",
             ],
+            parse=False,
+            **kwargs,
         )
 
         self.sweep_variables = sweep_variables
         self.event_name = event_name
         self.agebins = agebins or [1, 5, 125]
+        if agebin_type not in ("cumulative", "disjoint"):
+            raise ValueError(
+                f"agebin_type must be 'cumulative' or 'disjoint', got {agebin_type!r}"
+            )
+        self.agebin_type = agebin_type
         self.start_year = start_year
         self.ds_col = ds_col
         self.filter_exists = filter_exists
 
-    def filter(self, simulation: Simulation):
-        if self.filter_exists:
-            x = [
-                os.path.exists(os.path.join(simulation.get_path(), f))
-                for f in self.filenames
-            ]
-            return all(x)
-        else:
-            return True
-
-    def map(self, data, simulation: Simulation):
-        output_data = data[self.filenames[0]].copy() 
+    def select_simulation_data(self, data, simulation: Simulation):
+        output_data = self.load_event_recorder(
+            data, self.filenames[0], simulation, ["Time", "Event_Name", "Age"]
+        )
         output_data = output_data[output_data["Event_Name"] == self.event_name]
 
         simdata = pd.DataFrame()
         if len(output_data) > 0:  # there are events of this type
-            output_data["Day"] = output_data.loc[:, "Time"] % 365
-            output_data["year"] = output_data.loc[:, "Time"].apply(
-                lambda x: int(x / 365) + self.start_year
+            years, counts = count_by_year_and_agebin(
+                output_data["Time"].to_numpy(),
+                output_data["Age"].to_numpy() / 365,
+                self.agebins,
+                start_year=self.start_year,
+                cumulative=self.agebin_type == "cumulative",
             )
-            output_data["age in years"] = output_data.loc[:, "Age"] / 365
-
-            list_of_g = []
-            for agemax in self.agebins:
-                agemin = 0
-                d = output_data[
-                    (output_data["age in years"] < agemax)
-                    & (output_data["age in years"] > agemin)
-                ]
-                g = d.groupby(["year"])["Event_Name"].agg(len).reset_index()
-                g = g.rename(columns={"Event_Name": self.event_name})
-                g["agebin"] = agemax
-
-                list_of_g = list_of_g + [g]
 
-            simdata = pd.concat(list_of_g).reset_index(drop=True)
+            # One row per (agebin, year) with at least one event
+            n_years, n_bins = counts.shape
+            counts = counts.T.ravel()
+            keep = counts > 0
+            simdata = pd.DataFrame(
+                {
+                    "year": np.tile(years, n_bins)[keep],
+                    self.event_name: counts[keep],
+                    "agebin": np.repeat(self.agebins, n_years)[keep],
+                }
+            )
 
             for sweep_var in self.sweep_variables:
                 if sweep_var in simulation.tags.keys():
@@ -383,41 +1266,45 @@ class annualSevereTreatedByAgeAnalyzer(IAnalyzer):
             )
         return simdata
 
-    def reduce(self, all_data):
-        selected = [data for sim, data in all_data.items()]
-        if len(selected) == 0:
-            print("\nWarning: No data have been returned... Exiting...")
-            return
-
-        print(f"\nSaving outputs to: {self.working_dir}")
 
-        adf = pd.concat(selected).reset_index(drop=True)
-        adf.to_csv(
-            (
-                os.path.join(
-                    self.working_dir,
-                    "Treated_Severe_Yearly_Cases_By_Age.csv",
-                )
-            ),
-            index=False,
-        )
-
-
-class EventReporterAnalyzer(IAnalyzer):
+class EventReporterAnalyzer(BaseOutputAnalyzer):
     '''
     Pull out the ReportEventRecorder and stack them together.
+
+    columns and event_names optionally restrict the recorder to the given
+    columns and Event_Name values; only the columns are read.
     '''
 
-    def __init__(self, sweep_variables=None, working_dir='./', time_cutoff = 0):
+    output_name = 'events'
+
+    def __init__(self, sweep_variables=None, working_dir='./', time_cutoff = 0,
+                 columns=None, event_names=None, **kwargs):
         super(EventReporterAnalyzer, self).__init__(working_dir=working_dir,
-                                                    filenames=["output/ReportEventRecorder.csv"])
+                                                    filenames=["output/ReportEventRecorder.csv"],
+                                                    parse=False,
+                                                    **kwargs)
         self.sweep_variables = sweep_variables
         self.time_cutoff = time_cutoff
-
-    def map(self, data, simulation: Simulation):
-
-        df = data[self.filenames[0]]
-        df = df[df['Time'] >= self.time_cutoff].copy()
+        self.columns = columns
+        self.event_names = event_names
+
+    def select_simulation_data(self, data, simulation: Simulation):
+
+        usecols = None
+        if self.columns is not None:
+            usecols = list(dict.fromkeys(list(self.columns) + ['Time', 'Event_Name']))
+        df = self.load_event_recorder(data, self.filenames[0], simulation, usecols)
+        keep = np.ones(len(df), dtype=bool)
+        if self.time_cutoff is not None:
+            keep &= (df['Time'] >= self.time_cutoff).to_numpy()
+        if self.event_names is not None:
+            event_names = self.event_names
+            if isinstance(event_names, str):
+                event_names = [event_names]
+            keep &= df['Event_Name'].isin(event_names).to_numpy()
+        # The recorder may be shared with other analyzers, so this one gets a copy
+        columns = df.columns if self.columns is None else list(self.columns)
+        df = df.loc[keep, columns].reset_index(drop=True)
 
         # add tags
         for sweep_var in self.sweep_variables:
@@ -425,15 +1312,3 @@ class EventReporterAnalyzer(IAnalyzer):
                 df[sweep_var] = simulation.tags[sweep_var]
 
         return df
-
-    def reduce(self, all_data):
-        selected = [data for sim, data in all_data.items()]
-        if len(selected) == 0:
-            print("\nWarning: No data have been returned... Exiting...")
-            return
-
-        print(f'\nSaving outputs to: {self.working_dir}')
-
-        adf = pd.concat(selected).reset_index(drop=True)
-        adf.to_csv((os.path.join(self.working_dir, 'events.csv')),
-                   index=False, index_label=False)
\ No newline at end of file
@@ -0,0 +1,445 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+from queue import Empty
+
+import numpy as np
+import pandas as pd
+
+from simulation_emodpy.analyzer import analyzer_collection
+from simulation_emodpy.analyzer.local_analyze import LocalAnalyzeManager
+
+AGE_BINS = [0.25, 1, 2, 5, 10, 15, 30, 50, 125]
+
+# Channels of the summary reports besides AGEBIN_CHANNELS, so the readers
+# have to skip over data they do not use, as in the real reports
+EXTRA_AGEBIN_CHANNELS = [
+    "Annual Noted Fevers by Age Bin",
+    "Pf Gametocyte Prevalence by Age Bin",
+    "Mean Log Parasite Density by Age Bin",
+    "Annual Severe Incidence by Anemia by Age Bin",
+    "Annual Severe Incidence by Parasites by Age Bin",
+    "Annual Severe Incidence by Fever by Age Bin",
+]
+TIME_CHANNELS = [
+    "Annual EIR",
+    "PfPR_2to10",
+    "Blood Smear Parasite Prevalence",
+    "Average Population",
+]
+PFPR_BINS = [0, 50, 500, 5000, 50000, np.inf]
+
+EVENT_COUNTER_CHANNELS = [
+    "Received_Treatment",
+    "Received_Severe_Treatment",
+    "Received_NMF_Treatment",
+    "Received_SMC",
+    "Bednet_Got_New_One",
+]
+FILTERED_CHANNELS = [
+    "Statistical Population",
+    "New Clinical Cases",
+    "New Severe Cases",
+    "PfHRP2 Prevalence",
+    "Daily EIR",
+    "Infected",
+    "True Prevalence",
+]
+RECORDER_EVENTS = {
+    "Received_Treatment": 0.6,
+    "Received_NMF_Treatment": 0.25,
+    "Received_Severe_Treatment": 0.05,
+    "Births": 0.1,
+}
+
+SWEEP_VARIABLES = ["Sample_ID", "DS_Name", "archetype", "Run_Number"]
+
+
+def _dump(obj, path):
+    with open(path, "w") as f:
+        json.dump(obj, f)
+
+
+def summary_report(rng, n_times):
+    n_bins = len(AGE_BINS)
+    by_age = {}
+    for channel in list(analyzer_collection.AGEBIN_CHANNELS) + EXTRA_AGEBIN_CHANNELS:
+        by_age[channel] = rng.random((n_times, n_bins)).round(6).tolist()
+    by_age["Average Population by Age Bin"] = (
+        rng.integers(50, 500, (n_times, n_bins)).astype(float).tolist()
+    )
+    by_pfpr = rng.random((n_times, len(PFPR_BINS), n_bins)).round(6).tolist()
+
+    return {
+        "Metadata": {
+            "Age Bins": AGE_BINS,
+            "Parasitemia Bins": [float(x) for x in PFPR_BINS[:-1]] + [3.4e38],
+            "Reporting_Interval": 30,
+        },
+        "DataByTime": {
+            c: rng.random(n_times).round(6).tolist() for c in TIME_CHANNELS
+        },
+        "DataByTimeAndAgeBins": by_age,
+        "DataByTimeAndPfPRBinsAndAgeBins": {
+            "PfPR by Parasitemia and Age Bin": by_pfpr,
+        },
+    }
+
+
+def inset_chart(rng, channels, n_days):
+    return {
+        "Header": {"Channels": len(channels), "Timesteps": n_days},
+        "Channels": {
+            c: {"Units": "", "Data": rng.poisson(3, n_days).astype(float).tolist()}
+            for c in channels
+        },
+    }
+
+
+def event_recorder(rng, n_days, events_per_year):
+    n = rng.poisson(events_per_year * n_days / 365)
+    names = list(RECORDER_EVENTS)
+    p = np.array(list(RECORDER_EVENTS.values()))
+    return pd.DataFrame(
+        {
+            "Time": np.sort(rng.integers(1, n_days + 1, n)),
+            "Node_ID": 1,
+            "Event_Name": np.array(names)[rng.choice(len(names), n, p=p / p.sum())],
+            "Individual_ID": rng.integers(1, 10000, n),
+            "Age": rng.uniform(0, 80 * 365, n).round(3),
+            "Gender": rng.choice(["M", "F"], n),
+            "Infected": rng.integers(0, 2, n),
+            "Infectiousness": rng.random(n).round(6),
+        }
+    )
+
+
+def generate_tree(
+    job_dir,
+    n_ds=4,
+    n_samples=5,
+    n_seeds=2,
+    start_year=2023,
+    end_year=2030,
+    events_per_year=2000,
+    seed=0,
+):
+    """
+    Write a synthetic experiment in job_dir/suite/experiment/simulation
+    layout, with one simulation per DS, sample and seed and the output files
+    read by the analyzers in analyzer_collection.
+
+    Returns the experiment id.
+    """
+    rng = np.random.default_rng(seed)
+    experiment_id = "benchmark"
+    experiment_dir = os.path.join(job_dir, "suite_benchmark", experiment_id)
+    n_years = end_year - start_year
+    n_days = 365 * n_years
+
+    i = 0
+    for ds in range(n_ds):
+        for sample in range(n_samples):
+            for run in range(n_seeds):
+                sim_id = f"sim{i:06d}"
+                sim_dir = os.path.join(experiment_dir, sim_id)
+                output_dir = os.path.join(sim_dir, "output")
+                os.makedirs(output_dir)
+
+                for year in range(start_year, end_year):
+                    _dump(
+                        summary_report(rng, 13),
+                        os.path.join(
+                            output_dir, f"MalariaSummaryReport_Monthly{year}.json"
+                        ),
+                    )
+                annual = f"MalariaSummaryReport_Annual_{start_year}to{end_year - 1}"
+                _dump(
+                    summary_report(rng, n_years),
+                    os.path.join(output_dir, f"{annual}.json"),
+                )
+                _dump(
+                    inset_chart(rng, EVENT_COUNTER_CHANNELS, n_days),
+                    os.path.join(output_dir, "ReportEventCounter.json"),
+                )
+                _dump(
+                    inset_chart(rng, FILTERED_CHANNELS, n_days),
+                    os.path.join(output_dir, "ReportMalariaFiltered.json"),
+                )
+                event_recorder(rng, n_days, events_per_year).to_csv(
+                    os.path.join(output_dir, "ReportEventRecorder.csv"), index=False
+                )
+
+                tags = {
+                    "Sample_ID": sample,
+                    "DS_Name": f"DS{ds:03d}",
+                    "archetype": f"DS{ds - ds % 4:03d}",
+                    "Run_Number": run,
+                }
+                _dump(
+                    {
+                        "id": sim_id,
+                        "item_type": "Simulation",
+                        "parent_id": experiment_id,
+                        "tags": tags,
+                    },
+                    os.path.join(sim_dir, "metadata.json"),
+                )
+                with open(os.path.join(sim_dir, "job_status.txt"), "w") as f:
+                    f.write("0")
+                i += 1
+
+    return experiment_id
+
+
+def benchmark_cases(start_year, end_year):
+    """
+    Analyzer class names and arguments of each benchmark case, set up the way
+    the analyze scripts run them.
+    """
+    cases = {
+        "MonthlyAgebinPfPRAnalyzer": [
+            (
+                "MonthlyAgebinPfPRAnalyzer",
+                dict(
+                    sweep_variables=SWEEP_VARIABLES,
+                    start_year=start_year,
+                    end_year=end_year,
+                ),
+            )
+        ],
+        "AnnualAgebinPfPRAnalyzer": [
+            (
+                "AnnualAgebinPfPRAnalyzer",
+                dict(
+                    sweep_variables=SWEEP_VARIABLES,
+                    start_year=start_year,
+                    end_year=end_year - 1,
+                ),
+            )
+        ],
+        "MonthlyTreatedCasesAnalyzer": [
+            (
+                "MonthlyTreatedCasesAnalyzer",
+                dict(sweep_variables=SWEEP_VARIABLES, start_year=start_year),
+            )
+        ],
+        "annualSevereTreatedByAgeAnalyzer": [
+            (
+                "annualSevereTreatedByAgeAnalyzer",
+                dict(sweep_variables=SWEEP_VARIABLES, start_year=start_year),
+            )
+        ],
+        "EventReporterAnalyzer": [
+            ("EventReporterAnalyzer", dict(sweep_variables=SWEEP_VARIABLES))
+        ],
+    }
+    cases["all"] = [a for c in list(cases.values()) for a in c]
+
+    return cases
+
+
+def _run_case(job_dir, experiment_id, analyzer_specs, working_dir, max_workers, queue):
+    try:
+        queue.put(
+            _time_case(job_dir, experiment_id, analyzer_specs, working_dir, max_workers)
+        )
+    except BaseException:
+        queue.put({"error": traceback.format_exc()})
+        raise
+
+
+def _time_case(job_dir, experiment_id, analyzer_specs, working_dir, max_workers):
+    analyzers = [
+        getattr(analyzer_collection, name)(working_dir=working_dir, **kwargs)
+        for name, kwargs in analyzer_specs
+    ]
+    manager = LocalAnalyzeManager(
+        job_dir=job_dir,
+        ids=[experiment_id],
+        analyzers=analyzers,
+        max_workers=max_workers,
+    )
+    simulations = manager.get_simulations()
+
+    input_bytes = 0
+    files = set(f for a in analyzers for f in a.filenames)
+    for simulation in simulations:
+        for f in files:
+            input_bytes += os.path.getsize(os.path.join(simulation.get_path(), f))
+
+    t0 = time.perf_counter()
+    manager.analyze()
+    seconds = time.perf_counter() - t0
+
+    return {
+        "n_simulations": len(simulations),
+        "input_mb": input_bytes / 2**20,
+        "seconds": seconds,
+        "sims_per_sec": len(simulations) / seconds,
+        "mb_per_sec": input_bytes / 2**20 / seconds,
+        "peak_rss_mb": analyzer_collection.peak_rss_mb(children=True),
+    }
+
+
+def _wait_for_result(name, process, queue, poll_s=5):
+    """
+    Result sent back by the process of a case. Raises if the case failed or
+    the process died without sending one.
+    """
+    while True:
+        try:
+            result = queue.get(timeout=poll_s)
+            break
+        except Empty:
+            if not process.is_alive():
+                raise RuntimeError(
+                    f"Benchmark case {name} exited with code {process.exitcode} "
+                    "without a result"
+                )
+    process.join()
+    if "error" in result:
+        raise RuntimeError(f"Benchmark case {name} failed:\n{result['error']}")
+    return result
+
+
+def run_benchmark(job_dir, experiment_id, cases, working_dir, max_workers=4):
+    """
+    Time each case end to end with LocalAnalyzeManager. Every case runs in a
+    fresh process so that its peak memory is measured on its own.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for name, analyzer_specs in cases.items():
+        case_dir = os.path.join(working_dir, name)
+        os.makedirs(case_dir, exist_ok=True)
+        queue = ctx.Queue()
+        p = ctx.Process(
+            target=_run_case,
+            args=(job_dir, experiment_id, analyzer_specs, case_dir, max_workers, queue),
+        )
+        p.start()
+        result = _wait_for_result(name, p, queue)
+        results[name] = result
+        print(
+            f"{name}: {result['sims_per_sec']:.1f} sims/s, "
+            f"{result['mb_per_sec']:.1f} MB/s, {result['peak_rss_mb']:.0f} MB peak"
+        )
+
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_file):
+    with open(baseline_file) as f:
+        baseline = json.load(f)["results"]
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        speedup = result["sims_per_sec"] / baseline[name]["sims_per_sec"]
+        memory = result["peak_rss_mb"] / baseline[name]["peak_rss_mb"]
+        print(f"{name}: {speedup:.2f}x throughput, {memory:.2f}x peak memory")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n_ds", dest="n_ds", type=int, default=4)
+    parser.add_argument("-samples", dest="samples", type=int, default=5)
+    parser.add_argument("-seeds", dest="seeds", type=int, default=2)
+    parser.add_argument("-start_year", dest="start_year", type=int, default=2023)
+    parser.add_argument("-end_year", dest="end_year", type=int, default=2030)
+    parser.add_argument("-events", dest="events", type=int, default=2000)
+    parser.add_argument("-workers", dest="workers", type=int, default=4)
+    parser.add_argument("-case", dest="cases", action="append")
+    parser.add_argument("-wdir", dest="wdir", type=str, default=None)
+    parser.add_argument("-out", dest="out", type=str, default=None)
+    parser.add_argument("-baseline", dest="baseline", type=str, default=None)
+    parser.add_argument("-keep", dest="keep", action="store_true")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Only directories created here are removed at the end
+    wdir = args.wdir or tempfile.mkdtemp(prefix="snt_benchmark_")
+    job_dir = os.path.join(wdir, "job_dir")
+    working_dir = os.path.join(wdir, "outputs")
+    for d in (job_dir, working_dir):
+        if os.path.exists(d):
+            sys.exit(f"{d} already exists, choose another -wdir")
+    if args.wdir is None or not os.path.exists(wdir):
+        created = [wdir]
+    else:
+        created = [job_dir, working_dir]
+
+    t0 = time.perf_counter()
+    experiment_id = generate_tree(
+        job_dir,
+        n_ds=args.n_ds,
+        n_samples=args.samples,
+        n_seeds=args.seeds,
+        start_year=args.start_year,
+        end_year=args.end_year,
+        events_per_year=args.events,
+    )
+    print(f"Generated synthetic experiment in {time.perf_counter() - t0:.1f}s")
+
+    cases = benchmark_cases(args.start_year, args.end_year)
+    if args.cases:
+        cases = {k: v for k, v in cases.items() if k in args.cases}
+    results = run_benchmark(
+        job_dir, experiment_id, cases, working_dir, max_workers=args.workers
+    )
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "json_backend": analyzer_collection.JSON_BACKEND,
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "n_ds": args.n_ds,
+            "samples": args.samples,
+            "seeds": args.seeds,
+            "start_year": args.start_year,
+            "end_year": args.end_year,
+            "events_per_year": args.events,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+    out = args.out or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+    if args.keep:
+        print(f"Synthetic experiment and outputs kept in {wdir}")
+    else:
+        for d in created:
+            shutil.rmtree(d, ignore_errors=True)
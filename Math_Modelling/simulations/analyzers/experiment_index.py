@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from simulation_emodpy.analyzer.local_analyze import (
+    find_experiment_dir,
+    read_job_status,
+)
+
+INDEX_NAME = "simulation_index.parquet"
+
+# Columns of the index besides the simulation tags
+INDEX_COLUMNS = [
+    "simid",
+    "outpath",
+    "status",
+    "output_files",
+    "output_sizes",
+    "output_bytes",
+]
+LIST_COLUMNS = ["output_files", "output_sizes"]
+
+
+def scan_simulation(sim_dir, output_subdir="output"):
+    """
+    Index record of one simulation directory: id, tags from metadata.json, job
+    status and the names and sizes of the files in output_subdir. Returns None
+    for directories that are not simulations.
+    """
+    try:
+        with open(os.path.join(sim_dir, "metadata.json")) as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        return None
+    if metadata.get("item_type", "Simulation").lower() != "simulation":
+        return None
+
+    files = []
+    try:
+        with os.scandir(os.path.join(sim_dir, output_subdir)) as it:
+            files = sorted((e.name, e.stat().st_size) for e in it if e.is_file())
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+
+    record = dict(metadata.get("tags", {}))
+    record.update(
+        simid=metadata.get("id", os.path.basename(sim_dir)),
+        outpath=sim_dir,
+        status=read_job_status(sim_dir),
+        output_files=[name for name, _ in files],
+        output_sizes=[size for _, size in files],
+        output_bytes=sum(size for _, size in files),
+    )
+    return record
+
+
+def _normalize_tags(df):
+    """
+    Store tags holding a mix of types (e.g. numbers and strings) as strings,
+    so the index can be written as parquet.
+    """
+    for col in df.columns:
+        if col in INDEX_COLUMNS or df[col].dtype != object:
+            continue
+        values = df[col].dropna()
+        if not values.map(lambda v: isinstance(v, str)).all():
+            df[col] = df[col].map(lambda v: v if v is None else str(v))
+    return df
+
+
+class ExperimentIndex:
+    """
+    Columnar index of the simulations of an experiment in the job directory,
+    with one row per simulation: tags, simulation directory (outpath), job
+    status and output file names and sizes.
+
+    The experiment is scanned once across a thread pool and the index saved
+    as parquet (by default in the experiment directory). refresh() only scans
+    the simulations that are new or had not succeeded at the last scan, so a
+    finished experiment is never walked again.
+
+    Args:
+        job_dir: job directory of the SLURM_LOCAL platform
+        experiment_id: experiment id (directory name or its suffix)
+        index_path: parquet file of the index
+        output_subdir: simulation subdirectory whose files are indexed
+    """
+
+    def __init__(
+        self,
+        job_dir,
+        experiment_id,
+        index_path=None,
+        output_subdir="output",
+        max_workers=32,
+    ):
+        self.experiment_dir = find_experiment_dir(job_dir, experiment_id)
+        self.index_path = index_path or os.path.join(self.experiment_dir, INDEX_NAME)
+        self.output_subdir = output_subdir
+        self.max_workers = max_workers
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return None
+        df = pd.read_parquet(self.index_path)
+        for col in LIST_COLUMNS:
+            df[col] = df[col].map(list)
+        return df
+
+    def refresh(self):
+        """
+        Bring the index up to date with the experiment directory and return
+        it as a DataFrame sorted by simulation directory.
+        """
+        with os.scandir(self.experiment_dir) as it:
+            sim_dirs = sorted(e.path for e in it if e.is_dir())
+
+        existing = self.load()
+        if existing is not None:
+            done = existing["status"].astype(str).eq("0") & existing[
+                "outpath"
+            ].isin(sim_dirs)
+            existing = existing[done]
+            indexed = set(existing["outpath"])
+        else:
+            indexed = set()
+        to_scan = [d for d in sim_dirs if d not in indexed]
+        if not to_scan and existing is not None:
+            return existing.reset_index(drop=True)
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            records = executor.map(
+                lambda d: scan_simulation(d, self.output_subdir), to_scan
+            )
+            scanned = pd.DataFrame([r for r in records if r is not None])
+
+        frames = [f for f in (existing, scanned) if f is not None and len(f)]
+        df = pd.concat(frames, ignore_index=True) if frames else scanned
+        if len(df):
+            df = _normalize_tags(df.sort_values("outpath").reset_index(drop=True))
+            df.to_parquet(self.index_path, index=False)
+        print(
+            f"Indexed {len(to_scan)} of {len(sim_dirs)} simulations of "
+            f"{self.experiment_dir}"
+        )
+        return df
+
+
+def index_experiment(job_dir, experiment_id, **kwargs):
+    """
+    Refreshed index of an experiment, see ExperimentIndex.
+    """
+    return ExperimentIndex(job_dir, experiment_id, **kwargs).refresh()
+
+
+def simulation_directory_df(job_dir, experiment_id, **kwargs):
+    """
+    Table of the simulations of an experiment with their tags and outpath,
+    like platform.create_sim_directory_df, read from the experiment index.
+    """
+    df = index_experiment(job_dir, experiment_id, **kwargs)
+    return df.drop(columns=LIST_COLUMNS)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-job_dir", dest="job_dir", type=str, required=True)
+    parser.add_argument("-id", dest="expt_id", type=str, required=True)
+    parser.add_argument("-index", dest="index_path", type=str, default=None)
+    parser.add_argument("-csv", dest="csv", type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    df = simulation_directory_df(
+        args.job_dir, args.expt_id, index_path=args.index_path
+    )
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"Saved {len(df)} simulations to {args.csv}")
@@ -0,0 +1,230 @@
+import glob
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from tqdm import tqdm
+
+from simulation_emodpy.analyzer.analyzer_collection import OUTPUT_INDEX
+
+_worker_analyzers = None
+
+
+class LocalSimulation:
+    """
+    Simulation read straight from its directory in the job directory, with the
+    attributes the analyzers use (id, tags, experiment_id, get_path).
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        metadata = metadata or {}
+        self.id = metadata.get("id", os.path.basename(path))
+        self.uid = self.id
+        self.tags = metadata.get("tags", {})
+        self.experiment_id = metadata.get("parent_id")
+        self.parent_id = self.experiment_id
+        self.status = read_job_status(path)
+
+    def get_path(self):
+        return self.path
+
+    @property
+    def succeeded(self):
+        return self.status == "0"
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __eq__(self, other):
+        return isinstance(other, LocalSimulation) and self.path == other.path
+
+    def __repr__(self):
+        return f"<LocalSimulation {self.id}>"
+
+
+def read_job_status(path):
+    status_file = os.path.join(path, "job_status.txt")
+    if not os.path.exists(status_file):
+        return None
+    with open(status_file) as f:
+        return f.read().strip()
+
+
+def find_experiment_dir(job_dir, experiment_id):
+    """
+    Locate job_dir/<suite>/<experiment> for an experiment id. Directories are
+    named either by the id or by <name>_<id>.
+    """
+    for path in glob.glob(os.path.join(job_dir, "*", f"*{experiment_id}")):
+        name = os.path.basename(path)
+        if os.path.isdir(path) and (
+            name == experiment_id or name.endswith(f"_{experiment_id}")
+        ):
+            return path
+    raise FileNotFoundError(f"Experiment {experiment_id} not found in {job_dir}")
+
+
+def list_simulations(experiment_dir):
+    """
+    List the simulations of an experiment directory, with their tags read from
+    each simulation's metadata.json.
+    """
+    simulations = []
+    with os.scandir(experiment_dir) as it:
+        entries = sorted((e for e in it if e.is_dir()), key=lambda e: e.name)
+    for entry in entries:
+        metadata_file = os.path.join(entry.path, "metadata.json")
+        if not os.path.exists(metadata_file):
+            continue
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+        if metadata.get("item_type", "Simulation").lower() != "simulation":
+            continue
+        simulations.append(LocalSimulation(entry.path, metadata))
+
+    return simulations
+
+
+def build_output_index(analyzers, experiment_dirs):
+    """
+    List the output directories of the experiments for the analyzers with
+    filter_exists="index" in OUTPUT_INDEX of this process.
+
+    Call it before AnalyzeManager.analyze() when using the idmtools
+    AnalyzeManager: its thread workers share the index and forked process
+    workers inherit it, instead of each worker listing the experiment again.
+    LocalAnalyzeManager builds it itself.
+    """
+    subdirs = set(
+        os.path.dirname(os.path.normpath(f))
+        for a in analyzers
+        if getattr(a, "filter_exists", False) == "index"
+        for f in a.filenames
+    )
+    OUTPUT_INDEX.clear()
+    for experiment_dir in experiment_dirs:
+        for subdir in subdirs:
+            OUTPUT_INDEX.listing(os.path.normpath(experiment_dir), subdir)
+
+
+def parse_file(filename, content):
+    """
+    Parse an output file the way idmtools does for analyzers with parse=True.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".json":
+        return json.loads(content)
+    if ext == ".csv":
+        return pd.read_csv(io.BytesIO(content))
+    if ext == ".txt":
+        return content.decode()
+    return content
+
+
+def _init_worker(analyzers, output_index):
+    global _worker_analyzers
+    _worker_analyzers = analyzers
+    OUTPUT_INDEX.update(output_index)
+
+
+def _map_simulation(simulation):
+    """
+    Run filter and map of every analyzer on one simulation, reading each file
+    at most once.
+    """
+    selected = [
+        (i, a) for i, a in enumerate(_worker_analyzers) if a.filter(simulation)
+    ]
+
+    contents = {}
+    for filename in set(f for _, a in selected for f in a.filenames):
+        with open(os.path.join(simulation.get_path(), filename), "rb") as f:
+            contents[filename] = f.read()
+
+    results = {}
+    for i, analyzer in selected:
+        data = {
+            f: parse_file(f, contents[f]) if analyzer.parse else contents[f]
+            for f in analyzer.filenames
+        }
+        results[i] = analyzer.map(data, simulation)
+
+    return results
+
+
+class LocalAnalyzeManager:
+    """
+    Run idmtools analyzers over experiments by walking the job directory
+    (job_dir/suite/experiment/simulation) directly, without a Platform.
+
+    Simulations are mapped in a process pool and each analyzer's reduce gets
+    the results of the simulations it accepted, in directory order. The
+    output index used by analyzers with filter_exists="index" is built once
+    here and handed to the workers.
+    """
+
+    def __init__(
+        self,
+        job_dir,
+        ids,
+        analyzers,
+        max_workers=None,
+        partial_analyze_ok=False,
+        analyze_failed_items=False,
+    ):
+        self.job_dir = job_dir
+        self.ids = ids
+        self.analyzers = analyzers
+        self.max_workers = max_workers or os.cpu_count()
+        self.partial_analyze_ok = partial_analyze_ok
+        self.analyze_failed_items = analyze_failed_items
+
+    def get_simulations(self):
+        simulations = []
+        self.experiment_dirs = []
+        for experiment_id in self.ids:
+            experiment_dir = find_experiment_dir(self.job_dir, experiment_id)
+            self.experiment_dirs.append(experiment_dir)
+            simulations += list_simulations(experiment_dir)
+
+        if self.analyze_failed_items:
+            return simulations
+        succeeded = [s for s in simulations if s.succeeded]
+        if len(succeeded) < len(simulations) and not self.partial_analyze_ok:
+            raise RuntimeError(
+                f"{len(simulations) - len(succeeded)} simulations have not "
+                "succeeded; set partial_analyze_ok=True to analyze the others"
+            )
+        return succeeded
+
+    def build_output_index(self):
+        build_output_index(self.analyzers, self.experiment_dirs)
+
+    def analyze(self):
+        simulations = self.get_simulations()
+        print(f"Analyzing {len(simulations)} simulations")
+
+        for analyzer in self.analyzers:
+            if hasattr(analyzer, "initialize"):
+                analyzer.initialize()
+        self.build_output_index()
+
+        all_data = [{} for _ in self.analyzers]
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self.analyzers, OUTPUT_INDEX.snapshot()),
+        ) as executor:
+            results = executor.map(_map_simulation, simulations, chunksize=16)
+            results = tqdm(zip(simulations, results), total=len(simulations))
+            for simulation, result in results:
+                for i, data in result.items():
+                    all_data[i][simulation] = data
+
+        for analyzer, data in zip(self.analyzers, all_data):
+            analyzer.reduce(data)
+
+        return True
@@ -0,0 +1,84 @@
+import json
+import threading
+
+import numpy as np
+
+# Only numpy and the standard library are imported here, so scripts running
+# without idmtools (e.g. under dtk-tools) can use these readers too
+
+
+def _json_backend():
+    for name in ("simdjson", "orjson"):
+        try:
+            return name, __import__(name)
+        except ImportError:
+            pass
+    return "json", json
+
+
+JSON_BACKEND, _json_module = _json_backend()
+_simdjson_local = threading.local()
+
+
+def _raw_decode_member(text, key):
+    """
+    Decode only the value of a top-level member of a JSON document, without
+    parsing the rest of it. Returns None if the member cannot be found.
+    """
+    pos = text.find(f'"{key}"')
+    if pos < 0:
+        return None
+    pos = text.index(":", pos + len(key) + 2) + 1
+    while text[pos] in " \t\r\n":
+        pos += 1
+
+    return json.JSONDecoder().raw_decode(text, pos)[0]
+
+
+def read_summary_report(content, channels, group="DataByTimeAndAgeBins"):
+    """
+    Read only the age bins and the requested channels of a
+    MalariaSummaryReport, as float arrays.
+
+    Uses pysimdjson when installed, which only materializes the requested
+    channels, then orjson, then the standard library, which decodes only the
+    Metadata and group members of the report.
+
+    Args:
+        content: raw report content (bytes or str)
+        channels: names of the channels to read from group
+        group: report section holding the channels
+
+    Returns:
+        dict shaped like the report: {"Metadata": {"Age Bins": [...]},
+        group: {channel: array}}
+    """
+    if JSON_BACKEND == "simdjson":
+        if not hasattr(_simdjson_local, "parser"):
+            _simdjson_local.parser = _json_module.Parser()
+        if isinstance(content, str):
+            content = content.encode()
+        doc = _simdjson_local.parser.parse(content)
+        age_bins = doc["Metadata"]["Age Bins"].as_list()
+        block = doc[group]
+        values = {}
+        for c in channels:
+            arr = block[c]
+            values[c] = np.frombuffer(arr.as_buffer(of_type="d"), np.float64)
+            values[c] = values[c].reshape(len(arr), -1)
+    else:
+        if JSON_BACKEND == "orjson":
+            doc = _json_module.loads(content)
+            metadata, block = doc["Metadata"], doc[group]
+        else:
+            if isinstance(content, (bytes, bytearray)):
+                content = content.decode()
+            metadata = _raw_decode_member(content, "Metadata")
+            block = _raw_decode_member(content, group)
+            if metadata is None or block is None:
+                doc = json.loads(content)
+                metadata, block = doc["Metadata"], doc[group]
+        age_bins = metadata["Age Bins"]
+        values = {c: np.asarray(block[c], dtype=np.float64) for c in channels}
+
+    return {"Metadata": {"Age Bins": age_bins}, group: values}
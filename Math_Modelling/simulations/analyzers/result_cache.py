@@ -0,0 +1,310 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "snt_analyzers")
+DEFAULT_MAX_MB = 10 * 1024
+
+
+def _path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path)
+        for f in files
+    )
+
+
+def _path_mtime(path):
+    """
+    Latest modification time of a file or of a directory and its files, or
+    None if the path does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    if os.path.isfile(path):
+        return os.stat(path).st_mtime_ns
+    return max(
+        [os.stat(path).st_mtime_ns]
+        + [
+            os.stat(os.path.join(root, f)).st_mtime_ns
+            for root, _, files in os.walk(path)
+            for f in files
+        ]
+    )
+
+
+def _copy(src, dst):
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    if os.path.isdir(src):
+        shutil.copytree(src, dst)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        shutil.copy2(src, dst)
+
+
+def _package_modules(module, package):
+    """
+    The module, if it is in package, and the modules of package it refers to
+    at module level, directly or through each other.
+    """
+    found = {}
+    todo = [module]
+    while todo:
+        module = todo.pop()
+        if (
+            module.__name__ in found
+            or module.__name__.split(".")[0] != package
+            or not getattr(module, "__file__", None)
+        ):
+            continue
+        found[module.__name__] = module
+        for value in vars(module).values():
+            name = value.__name__ if inspect.ismodule(value) else None
+            name = name or getattr(value, "__module__", None)
+            if isinstance(name, str) and name in sys.modules:
+                todo.append(sys.modules[name])
+    return found
+
+
+def code_version(analyzer_cls, manager_cls=None):
+    """
+    Hash of the source files defining the analyzer class and the analyze
+    manager, and of the modules of the analyzer's package they use, e.g.
+    report_readers for the analyzers of analyzer_collection, so a change to
+    any of them invalidates the cached outputs. Modules of other packages
+    (e.g. the idmtools AnalyzeManager) are not followed.
+    """
+    package = analyzer_cls.__module__.split(".")[0]
+    modules = {}
+    for cls in (analyzer_cls, manager_cls):
+        if cls is not None:
+            modules.update(_package_modules(sys.modules[cls.__module__], package))
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        with open(modules[name].__file__, "rb") as f:
+            digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Local content-addressed cache of reduced analyzer outputs.
+
+    Entries are keyed by the experiment ids, the analyzer class, its
+    parameters (analyzer_params() plus the output format) and the version of
+    the code it is run with (see code_version), and hold a copy of the analyzer's output file or
+    parquet dataset. The least recently used entries are evicted when the
+    cache grows over max_mb.
+
+    The key does not follow the contents of the experiment: invalidate the
+    entries of an experiment that is still running or was re-run.
+    """
+
+    def __init__(self, cache_dir=None, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir or os.environ.get(
+            "ANALYZER_CACHE_DIR", DEFAULT_CACHE_DIR
+        )
+        self.max_bytes = max_mb * 1024**2
+
+    @staticmethod
+    def cacheable(analyzer):
+        return hasattr(analyzer, "analyzer_params") and hasattr(analyzer, "output_path")
+
+    def key_fields(self, experiment_ids, analyzer, manager_cls=None):
+        params = analyzer.analyzer_params()
+        params["output_format"] = analyzer.output_format
+        params["partition_cols"] = analyzer.partition_cols
+        return {
+            "experiment_ids": sorted(str(x) for x in experiment_ids),
+            "analyzer": f"{type(analyzer).__module__}.{type(analyzer).__qualname__}",
+            "params": params,
+            "code_version": code_version(type(analyzer), manager_cls),
+        }
+
+    def key(self, experiment_ids, analyzer, manager_cls=None):
+        fields = self.key_fields(experiment_ids, analyzer, manager_cls)
+        blob = json.dumps(fields, sort_keys=True, default=repr).encode()
+        return hashlib.sha256(blob).hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def entries(self):
+        """
+        Metadata of every cache entry, least recently used first.
+        """
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                meta_file = os.path.join(prefix_dir, key, "entry.json")
+                try:
+                    with open(meta_file) as f:
+                        meta = json.load(f)
+                    meta["last_used"] = os.path.getmtime(meta_file)
+                except (OSError, ValueError):
+                    continue  # incomplete entry
+                entries.append(meta)
+
+        return sorted(entries, key=lambda m: m["last_used"])
+
+    def restore(self, experiment_ids, analyzer, manager_cls=None):
+        """
+        Copy the cached output of the analyzer (run by manager_cls) to its
+        output path. Returns False if there is no cached output.
+        """
+        key = self.key(experiment_ids, analyzer, manager_cls)
+        entry = self.entry_dir(key)
+        meta_file = os.path.join(entry, "entry.json")
+        if not os.path.exists(meta_file):
+            return False
+        with open(meta_file) as f:
+            meta = json.load(f)
+        _copy(os.path.join(entry, meta["output"]), analyzer.output_path())
+        os.utime(meta_file)
+        return True
+
+    def store(self, experiment_ids, analyzer, written_after=None, manager_cls=None):
+        """
+        Add the output written by the analyzer to the cache, then evict the
+        least recently used entries over max_mb.
+
+        With written_after (a modification time in ns from before the
+        analysis ran), an output that was not written since is left out of
+        the cache: it is a stale file from an earlier run.
+        """
+        output = analyzer.output_path()
+        mtime = _path_mtime(output)
+        if mtime is None:
+            return False
+        if written_after is not None and mtime <= written_after:
+            print(f"{analyzer.uid}: {output} was not rewritten, not caching it")
+            return False
+        key = self.key(experiment_ids, analyzer, manager_cls)
+        entry = self.entry_dir(key)
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+
+        name = os.path.basename(output)
+        _copy(output, os.path.join(tmp, name))
+        meta = dict(self.key_fields(experiment_ids, analyzer, manager_cls))
+        meta.update(
+            key=key,
+            output=name,
+            size=_path_size(os.path.join(tmp, name)),
+            created=time.time(),
+        )
+        with open(os.path.join(tmp, "entry.json"), "w") as f:
+            json.dump(meta, f, default=repr)
+
+        if os.path.isdir(entry):
+            shutil.rmtree(entry)
+        os.replace(tmp, entry)
+        self.evict()
+        return True
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(m["size"] for m in entries)
+        for meta in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self.entry_dir(meta["key"]), ignore_errors=True)
+            total -= meta["size"]
+
+    def invalidate(self, experiment_id=None, analyzer=None):
+        """
+        Remove the entries of an experiment and/or analyzer class name (all
+        entries if neither is given). Returns the number of entries removed.
+        """
+        removed = 0
+        for meta in self.entries():
+            if experiment_id is not None and experiment_id not in meta["experiment_ids"]:
+                continue
+            if analyzer is not None and meta["analyzer"].rsplit(".", 1)[-1] != analyzer:
+                continue
+            shutil.rmtree(self.entry_dir(meta["key"]), ignore_errors=True)
+            removed += 1
+        return removed
+
+
+def cached_analyze(manager_cls, ids, analyzers, cache=None, **kwargs):
+    """
+    Run manager_cls(ids=ids, analyzers=..., **kwargs).analyze() for the
+    analyzers whose output is not in the cache, and restore the cached
+    outputs of the others. Without a cache all analyzers are run.
+
+    Works with the idmtools AnalyzeManager (ids as (id, ItemType) tuples)
+    and with LocalAnalyzeManager.
+    """
+    experiment_ids = [x[0] if isinstance(x, tuple) else x for x in ids]
+    to_run = []
+    for analyzer in analyzers:
+        if (
+            cache is not None
+            and cache.cacheable(analyzer)
+            and cache.restore(experiment_ids, analyzer, manager_cls)
+        ):
+            print(f"{analyzer.uid}: restored cached output to {analyzer.output_path()}")
+        else:
+            to_run.append(analyzer)
+
+    if not to_run:
+        return True
+    # Outputs left over from an earlier run must not be cached as this one's
+    before = {
+        id(a): _path_mtime(a.output_path()) or -1
+        for a in to_run
+        if cache is not None and cache.cacheable(a)
+    }
+    manager = manager_cls(ids=ids, analyzers=to_run, **kwargs)
+    result = manager.analyze()
+    if cache is not None:
+        for analyzer in to_run:
+            if cache.cacheable(analyzer):
+                cache.store(
+                    experiment_ids,
+                    analyzer,
+                    written_after=before[id(analyzer)],
+                    manager_cls=manager_cls,
+                )
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["list", "invalidate"])
+    parser.add_argument("-id", dest="expt_id", type=str, default=None)
+    parser.add_argument("-analyzer", dest="analyzer", type=str, default=None)
+    parser.add_argument("-cache_dir", dest="cache_dir", type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cache = ResultCache(args.cache_dir)
+
+    if args.command == "list":
+        for meta in cache.entries():
+            print(
+                f"{meta['key'][:12]}  {','.join(meta['experiment_ids'])}  "
+                f"{meta['analyzer'].rsplit('.', 1)[-1]}  {meta['size'] / 1024**2:.1f} MB"
+            )
+    else:
+        n = cache.invalidate(args.expt_id, args.analyzer)
+        print(f"Removed {n} cache entries from {cache.cache_dir}")
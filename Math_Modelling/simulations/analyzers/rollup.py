@@ -0,0 +1,206 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Population columns of guinea_DS_pop.csv usable as roll-up weights
+WEIGHT_COLUMNS = ["Population_2016", "Pop_U_0_4", "pop_U1"]
+STRATA_COLUMNS = ["PEC", "MILDA", "CPS", "CPP", "seasonality_archetype_2"]
+
+# Key columns of the analyzer outputs kept as dims by default
+DIM_COLUMNS = ["Sample_ID", "Run_Number", "year", "month", "agebin"]
+
+
+class StratumRollup:
+    """
+    Aggregate DS-level analyzer outputs to strata of guinea_DS_pop.csv.
+
+    Every row of the output is mapped to its stratum through the DS code, and
+    each measure is rolled up with a single np.bincount over the (stratum,
+    dims) cells present in the data, for all samples, seeds, years and age
+    bins at once, so memory grows with the number of rows only. Rates (e.g.
+    PfPR) are averaged with population weights over the DS present in the
+    data, counts (e.g. cases) are summed.
+
+    Args:
+        pop_df: DS table with ds_col, the by columns and the weight column
+        by: strata column(s), e.g. "PEC" or ["CPS", "CPP"]; None rolls up to
+            national level
+        weight: population column used as weight
+        ds_col: DS column of pop_df and of the analyzer outputs
+    """
+
+    def __init__(self, pop_df, by=None, weight="Population_2016", ds_col="DS_Name"):
+        if isinstance(by, str):
+            by = [by]
+        self.by = list(by or [])
+        self.weight = weight
+        self.ds_col = ds_col
+
+        pop_df = pop_df.drop_duplicates(ds_col)
+        self.ds_index = pd.Index(pop_df[ds_col])
+        self.population = pop_df[weight].to_numpy(dtype=np.float64)
+        if self.by:
+            # DS with a missing stratum value form a stratum of their own
+            grouped = pop_df.groupby(self.by, sort=True, dropna=False)
+            self.codes = grouped.ngroup().to_numpy(dtype=np.int64)
+            self.strata = grouped.size().index.to_frame(index=False)
+        else:
+            self.codes = np.zeros(len(pop_df), dtype=np.int64)
+            self.strata = pd.DataFrame(index=[0])
+
+    @classmethod
+    def from_csv(cls, pop_csv, **kwargs):
+        return cls(pd.read_csv(pop_csv), **kwargs)
+
+    def _layout(self, df, dims):
+        """
+        Row (DS) and column (combination of dims) position of every row of df.
+        """
+        ds = self.ds_index.get_indexer(df[self.ds_col])
+        if (ds < 0).any():
+            unknown = sorted(set(df[self.ds_col][ds < 0]))
+            raise ValueError(f"DS not in the population table: {unknown}")
+
+        if dims:
+            grouped = df.groupby(dims, sort=True, observed=True, dropna=False)
+            col = grouped.ngroup().to_numpy()
+            keys = grouped.size().index.to_frame(index=False)
+        else:
+            col = np.zeros(len(df), dtype=np.int64)
+            keys = pd.DataFrame(index=[0])
+
+        cell = ds.astype(np.int64) * len(keys) + col
+        if len(np.unique(cell)) < len(cell):
+            raise ValueError(
+                f"Several rows per {self.ds_col} and {dims}; "
+                "add the missing dimensions to dims"
+            )
+        return ds, col, keys
+
+    def rollup(self, df, rates=(), counts=(), dims=None, scale_by=None):
+        """
+        Roll up an analyzer output to the strata.
+
+        Args:
+            df: long-format analyzer output with ds_col
+            rates: measures averaged with population weights
+            counts: measures summed over the DS of each stratum
+            dims: columns kept in the output (default: the DIM_COLUMNS in df,
+                i.e. Sample_ID, Run_Number, year, month, agebin); other key
+                columns, e.g. scenario tags, have to be listed explicitly
+            scale_by: simulated population column; if given, counts are
+                scaled by DS population / scale_by before they are summed
+
+        Returns:
+            DataFrame with the by columns, dims and measures
+        """
+        rates, counts = list(rates), list(counts)
+        measures = rates + counts
+        if dims is None:
+            dims = [c for c in DIM_COLUMNS if c in df.columns]
+        ds, col, keys = self._layout(df, dims)
+
+        # (stratum, dims) cell of every row, numbered over the cells with rows
+        cells, cell = np.unique(
+            self.codes[ds] * len(keys) + col.astype(np.int64), return_inverse=True
+        )
+        cell = cell.ravel()
+        weight = self.population[ds]
+
+        out = {}
+        covered = np.zeros(len(cells), dtype=bool)
+        for measure in measures:
+            values = df[measure].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            if measure in counts and scale_by is not None:
+                values = values * weight / df[scale_by].to_numpy()
+
+            if measure in rates:
+                total = np.bincount(
+                    cell[present], weights=weight[present], minlength=len(cells)
+                )
+                x = np.bincount(
+                    cell[present],
+                    weights=weight[present] * values[present],
+                    minlength=len(cells),
+                )
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    out[measure] = x / total
+            else:
+                total = np.bincount(cell[present], minlength=len(cells))
+                out[measure] = np.bincount(
+                    cell[present], weights=values[present], minlength=len(cells)
+                )
+                out[measure][total == 0] = np.nan
+            covered |= total > 0
+
+        # One row per stratum and dims combination with data
+        stratum, column = np.divmod(cells[covered], len(keys))
+        result = pd.concat(
+            [
+                self.strata.iloc[stratum].reset_index(drop=True),
+                keys.iloc[column].reset_index(drop=True),
+            ],
+            axis=1,
+        )
+        for measure in measures:
+            result[measure] = out[measure][covered]
+
+        return result
+
+
+def rollup_output(
+    df, pop_df, by=None, weight="Population_2016", ds_col="DS_Name", **kwargs
+):
+    """
+    Roll up an analyzer output to the strata of pop_df in one call, see
+    StratumRollup.rollup for the arguments.
+    """
+    roller = StratumRollup(pop_df, by=by, weight=weight, ds_col=ds_col)
+    return roller.rollup(df, **kwargs)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-input", dest="input", type=str, required=True)
+    parser.add_argument("-pop_csv", dest="pop_csv", type=str, required=True)
+    parser.add_argument("-by", dest="by", type=str, nargs="*", default=[])
+    parser.add_argument(
+        "-weight", dest="weight", type=str, default="Population_2016"
+    )
+    parser.add_argument("-rates", dest="rates", type=str, nargs="*", default=[])
+    parser.add_argument("-counts", dest="counts", type=str, nargs="*", default=[])
+    parser.add_argument("-dims", dest="dims", type=str, nargs="*", default=None)
+    parser.add_argument("-scale_by", dest="scale_by", type=str, default=None)
+    parser.add_argument("-out", dest="out", type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if os.path.isdir(args.input):  # parquet dataset
+        df = pd.read_parquet(args.input)
+    else:
+        df = pd.read_csv(args.input)
+    result = rollup_output(
+        df,
+        pd.read_csv(args.pop_csv),
+        by=args.by,
+        weight=args.weight,
+        rates=args.rates,
+        counts=args.counts,
+        dims=args.dims,
+        scale_by=args.scale_by,
+    )
+
+    stem = os.path.splitext(os.path.basename(args.input.rstrip("/")))[0]
+    suffix = "_".join(args.by) or "national"
+    out = args.out or os.path.join(
+        os.path.dirname(args.input.rstrip("/")), f"{stem}_by_{suffix}.csv"
+    )
+    result.to_csv(out, index=False)
+    print(f"Saved {len(result)} rows to {out}")
@@ -0,0 +1,229 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.special import betaln, gammaln
+
+TARGET_KEYS = ["year", "month", "agebin", "age_min", "age_max"]
+
+
+def seed_average(sim_df, keys, measures=("PfPR", "Pop")):
+    """
+    Average the measures of the analyzer output over seeds (Run_Number) and
+    any other column not in keys.
+    """
+    return (
+        sim_df.groupby(keys, observed=True, sort=False)[list(measures)]
+        .mean()
+        .reset_index()
+    )
+
+
+def aggregate_age_groups(sim_df, age_groups, keys, measure="PfPR"):
+    """
+    Population-weighted measure over the age bins of each (age_min, age_max)
+    group. Age bins are labelled by their upper edge, so a group covers the
+    bins with age_min < agebin <= age_max.
+    """
+    frames = []
+    for age_min, age_max in age_groups:
+        sel = sim_df[(sim_df["agebin"] > age_min) & (sim_df["agebin"] <= age_max)]
+        sums = (
+            sel.assign(_weighted=sel[measure] * sel["Pop"])
+            .groupby(keys, observed=True, sort=False)[["_weighted", "Pop"]]
+            .sum()
+        )
+        df = (sums["_weighted"] / sums["Pop"]).rename(measure).reset_index()
+        df["age_min"] = age_min
+        df["age_max"] = age_max
+        frames.append(df)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def binomial_loglik(k, n, p, eps=1e-6):
+    p = np.clip(p, eps, 1 - eps)
+    return (
+        gammaln(n + 1)
+        - gammaln(k + 1)
+        - gammaln(n - k + 1)
+        + k * np.log(p)
+        + (n - k) * np.log1p(-p)
+    )
+
+
+def beta_binomial_loglik(k, n, p, kappa=100, eps=1e-6):
+    """
+    Beta-binomial log-likelihood with mean p and concentration kappa (the
+    smaller kappa, the more overdispersed the survey counts).
+    """
+    p = np.clip(p, eps, 1 - eps)
+    a, b = p * kappa, (1 - p) * kappa
+    return (
+        gammaln(n + 1)
+        - gammaln(k + 1)
+        - gammaln(n - k + 1)
+        + betaln(k + a, n - k + b)
+        - betaln(a, b)
+    )
+
+
+def loglik_matrix(
+    sim_df,
+    targets,
+    likelihood="binomial",
+    kappa=100,
+    measure="PfPR",
+    ds_col="DS_Name",
+    sample_col="Sample_ID",
+):
+    """
+    Log-likelihood of every survey target under every sample.
+
+    Args:
+        sim_df: agebin analyzer output (e.g. Agebin_PfPR_ClinicalIncidence_monthly)
+        targets: survey table with ds_col, n_tested, n_positive and the
+            columns of TARGET_KEYS that locate each survey in the simulation
+            output; age_min/age_max aggregate several age bins
+        likelihood: "binomial" or "beta-binomial"
+        kappa: beta-binomial concentration
+
+    Returns:
+        (particles, targets, matrix): the (ds_col, sample_col) of each row,
+        the targets of each column, and the (particle, target) log-likelihood,
+        NaN where the target belongs to another DS
+    """
+    if likelihood not in ("binomial", "beta-binomial"):
+        raise ValueError(
+            f"likelihood must be 'binomial' or 'beta-binomial', got {likelihood!r}"
+        )
+    keys = [c for c in TARGET_KEYS if c in targets.columns]
+    targets = targets.reset_index(drop=True)
+    targets[ds_col] = targets[ds_col].astype(str)
+
+    sim_df = sim_df.assign(**{ds_col: sim_df[ds_col].astype(str)})
+    # Average over seeds and over the dimensions the targets do not resolve,
+    # e.g. over months for annual surveys
+    sim_keys = [ds_col, sample_col] + [c for c in keys if c in sim_df.columns]
+    if "age_min" in keys:
+        sim_keys.append("agebin")
+    averaged = seed_average(sim_df, sim_keys, measures=(measure, "Pop"))
+    if "age_min" in keys:
+        age_groups = targets[["age_min", "age_max"]].drop_duplicates()
+        group_keys = [c for c in sim_keys if c != "agebin"]
+        averaged = aggregate_age_groups(
+            averaged, age_groups.itertuples(index=False), group_keys, measure
+        )
+
+    grouped = averaged.groupby([ds_col, sample_col], sort=True, observed=True)
+    averaged["_particle"] = grouped.ngroup()
+    particles = grouped.size().index.to_frame(index=False)
+
+    merged = targets.reset_index(names="_target").merge(
+        averaged, on=[ds_col] + keys, how="inner"
+    )
+    k = merged["n_positive"].to_numpy(dtype=np.float64)
+    n = merged["n_tested"].to_numpy(dtype=np.float64)
+    p = merged[measure].to_numpy(dtype=np.float64)
+    if likelihood == "binomial":
+        ll = binomial_loglik(k, n, p)
+    else:
+        ll = beta_binomial_loglik(k, n, p, kappa)
+
+    matrix = np.full((len(particles), len(targets)), np.nan)
+    matrix[merged["_particle"].to_numpy(), merged["_target"].to_numpy()] = ll
+
+    return particles, targets, matrix
+
+
+def score_particles(sim_df, targets, ds_col="DS_Name", **kwargs):
+    """
+    Total log-likelihood of every (DS, sample) over the targets of its DS.
+    Samples missing the prediction for any of those targets get NaN.
+    """
+    particles, targets, matrix = loglik_matrix(
+        sim_df, targets, ds_col=ds_col, **kwargs
+    )
+
+    n_expected = particles[ds_col].map(targets[ds_col].value_counts()).fillna(0)
+    n_matched = np.isfinite(matrix).sum(axis=1)
+    scores = particles.copy()
+    complete = n_matched == n_expected
+    scores["loglik"] = np.where(complete, np.nansum(matrix, axis=1), np.nan)
+    scores["n_targets"] = n_matched
+
+    incomplete = (n_matched < n_expected).sum()
+    if incomplete:
+        print(f"Warning: {incomplete} samples lack predictions for some targets")
+    return scores
+
+
+def select_particles(
+    scores,
+    n_select=1,
+    samples_df=None,
+    ds_col="DS_Name",
+    sample_col="Sample_ID",
+    samples_id_col="id",
+):
+    """
+    Rank the samples of each DS by log-likelihood and keep the n_select best.
+    The likelihood weight of each sample within its DS is added, and with
+    samples_df (e.g. lhs_samples_v1.csv) the selected rows of the samples
+    table are returned, ready to be saved as the selected particles.
+    """
+    scores = scores.dropna(subset=["loglik"]).copy()
+    scores["rank"] = (
+        scores.groupby(ds_col)["loglik"]
+        .rank(ascending=False, method="first")
+        .astype(int)
+    )
+    best = scores.groupby(ds_col)["loglik"].transform("max")
+    scores["weight"] = np.exp(scores["loglik"] - best)
+    scores["weight"] /= scores.groupby(ds_col)["weight"].transform("sum")
+
+    selected = scores[scores["rank"] <= n_select].sort_values([ds_col, "rank"])
+    if samples_df is not None:
+        samples_df = samples_df.assign(**{ds_col: samples_df[ds_col].astype(str)})
+        selected = samples_df.merge(
+            selected.rename(columns={sample_col: samples_id_col}),
+            on=[ds_col, samples_id_col],
+            how="inner",
+        ).sort_values([ds_col, "rank"])
+
+    return selected.reset_index(drop=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-sim", dest="sim", type=str, required=True)
+    parser.add_argument("-targets", dest="targets", type=str, required=True)
+    parser.add_argument("-samples", dest="samples", type=str, default=None)
+    parser.add_argument(
+        "-likelihood", dest="likelihood", type=str, default="binomial"
+    )
+    parser.add_argument("-kappa", dest="kappa", type=float, default=100)
+    parser.add_argument("-n_select", dest="n_select", type=int, default=1)
+    parser.add_argument("-out", dest="out", type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    scores = score_particles(
+        pd.read_csv(args.sim),
+        pd.read_csv(args.targets),
+        likelihood=args.likelihood,
+        kappa=args.kappa,
+    )
+    samples_df = pd.read_csv(args.samples) if args.samples else None
+    selected = select_particles(scores, args.n_select, samples_df)
+
+    out = args.out or os.path.join(
+        os.path.dirname(args.sim), "selected_particles.csv"
+    )
+    selected.to_csv(out, index=False)
+    print(f"Saved {len(selected)} selected particles to {out}")
@@ -0,0 +1,156 @@
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("idmtools")
+
+from simulation_emodpy.analyzer.analyzer_collection import (  # noqa: E402
+    AnnualAgebinPfPRAnalyzer,
+    MonthlyAgebinPfPRAnalyzer,
+)
+from simulation_emodpy.analyzer.benchmark_analyzers import (  # noqa: E402
+    generate_tree,
+)
+from simulation_emodpy.analyzer.local_analyze import (  # noqa: E402
+    LocalAnalyzeManager,
+    find_experiment_dir,
+    list_simulations,
+)
+
+START_YEAR, END_YEAR = 2023, 2026
+SWEEP_VARIABLES = ["Sample_ID", "DS_Name", "archetype", "Run_Number"]
+RENAME = {
+    "PfPR by Age Bin": "PfPR",
+    "Annual Clinical Incidence by Age Bin": "Cases",
+    "Annual Severe Incidence by Age Bin": "Severe cases",
+    "New Infections by Age Bin": "New infections",
+    "Average Population by Age Bin": "Pop",
+}
+MEASURES = ["PfPR", "Cases", "Severe cases", "New infections", "Pop"]
+
+
+def baseline_monthly(report_files, tags):
+    """
+    Map of MonthlyAgebinPfPRAnalyzer before the analyzers were vectorized.
+    """
+    adf = []
+    for year, fname in zip(range(START_YEAR, END_YEAR), report_files):
+        with open(fname) as f:
+            data = json.load(f)
+        age_bins = data["Metadata"]["Age Bins"]
+        df = pd.DataFrame.from_dict(data["DataByTimeAndAgeBins"], orient="columns")[
+            :-1
+        ]
+        df["month"] = [[x] * len(age_bins) for x in range(1, len(df) + 1)]
+        df["agebin"] = [age_bins] * len(df)
+        df = df.rename(columns=RENAME)[["agebin", "month"] + MEASURES]
+        df = df.explode(list(df.columns))
+        df["year"] = year
+        adf.append(df)
+    adf = pd.concat(adf)
+    for sweep_var in SWEEP_VARIABLES:
+        adf[sweep_var] = tags[sweep_var]
+    return adf
+
+
+def baseline_annual(report_file, tags, end_year):
+    """
+    Map of AnnualAgebinPfPRAnalyzer before the analyzers were vectorized.
+    """
+    with open(report_file) as f:
+        data = json.load(f)
+    age_bins = data["Metadata"]["Age Bins"]
+    df = pd.DataFrame.from_dict(data["DataByTimeAndAgeBins"], orient="columns")
+    df["year"] = [[x] * len(age_bins) for x in range(START_YEAR, end_year + 1)]
+    df["agebin"] = [age_bins] * len(df)
+    df = df.rename(columns=RENAME)[["agebin", "year"] + MEASURES]
+    df = df.explode(list(df.columns))
+    for sweep_var in SWEEP_VARIABLES:
+        df[sweep_var] = tags[sweep_var]
+    return df
+
+
+@pytest.fixture(scope="module")
+def experiment(tmp_path_factory):
+    job_dir = str(tmp_path_factory.mktemp("job_dir"))
+    experiment_id = generate_tree(
+        job_dir,
+        n_ds=2,
+        n_samples=2,
+        n_seeds=1,
+        start_year=START_YEAR,
+        end_year=END_YEAR,
+        events_per_year=10,
+    )
+    simulations = list_simulations(find_experiment_dir(job_dir, experiment_id))
+    return job_dir, experiment_id, simulations
+
+
+def run_analyzer(experiment, analyzer):
+    job_dir, experiment_id, _ = experiment
+    LocalAnalyzeManager(
+        job_dir=job_dir, ids=[experiment_id], analyzers=[analyzer], max_workers=2
+    ).analyze()
+    return pd.read_csv(analyzer.output_path(), dtype=str)
+
+
+def assert_matches_baseline(output, baseline, compact_dtypes):
+    baseline = pd.read_csv(
+        io.StringIO(baseline.to_csv(index=False)), dtype=str
+    )
+    assert list(output.columns) == list(baseline.columns)
+    assert len(output) == len(baseline)
+    if not compact_dtypes:
+        pd.testing.assert_frame_equal(output, baseline)
+        return
+
+    # float32 measures are written with fewer digits
+    keys = [c for c in output.columns if c not in MEASURES]
+    pd.testing.assert_frame_equal(output[keys], baseline[keys])
+    np.testing.assert_allclose(
+        output[MEASURES].astype(float), baseline[MEASURES].astype(float), rtol=1e-6
+    )
+
+
+@pytest.mark.parametrize("compact_dtypes", [False, True])
+def test_monthly_matches_baseline(experiment, tmp_path, compact_dtypes):
+    analyzer = MonthlyAgebinPfPRAnalyzer(
+        sweep_variables=SWEEP_VARIABLES,
+        working_dir=str(tmp_path),
+        start_year=START_YEAR,
+        end_year=END_YEAR,
+        compact_dtypes=compact_dtypes,
+    )
+    output = run_analyzer(experiment, analyzer)
+
+    baseline = pd.concat(
+        baseline_monthly(
+            [os.path.join(s.get_path(), f) for f in analyzer.filenames], s.tags
+        )
+        for s in experiment[2]
+    )
+    assert_matches_baseline(output, baseline, compact_dtypes)
+
+
+@pytest.mark.parametrize("compact_dtypes", [False, True])
+def test_annual_matches_baseline(experiment, tmp_path, compact_dtypes):
+    analyzer = AnnualAgebinPfPRAnalyzer(
+        sweep_variables=SWEEP_VARIABLES,
+        working_dir=str(tmp_path),
+        start_year=START_YEAR,
+        end_year=END_YEAR - 1,
+        compact_dtypes=compact_dtypes,
+    )
+    output = run_analyzer(experiment, analyzer)
+
+    baseline = pd.concat(
+        baseline_annual(
+            os.path.join(s.get_path(), analyzer.filenames[0]), s.tags, END_YEAR - 1
+        )
+        for s in experiment[2]
+    )
+    assert_matches_baseline(output, baseline, compact_dtypes)
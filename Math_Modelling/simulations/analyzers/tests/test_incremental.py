@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("idmtools")
+
+from simulation_emodpy.analyzer.analyzer_collection import (  # noqa: E402
+    EventReporterAnalyzer,
+)
+from simulation_emodpy.analyzer.benchmark_analyzers import (  # noqa: E402
+    generate_tree,
+)
+from simulation_emodpy.analyzer.local_analyze import (  # noqa: E402
+    LocalAnalyzeManager,
+    find_experiment_dir,
+    list_simulations,
+)
+
+SWEEP_VARIABLES = ["Sample_ID", "DS_Name", "archetype", "Run_Number"]
+
+
+def event_reporter(working_dir):
+    # Tuple parameters are stored as lists in the ledger
+    return EventReporterAnalyzer(
+        sweep_variables=SWEEP_VARIABLES,
+        working_dir=working_dir,
+        columns=("Time", "Event_Name", "Age"),
+        event_names=("Received_Treatment", "Received_Severe_Treatment"),
+        incremental=True,
+    )
+
+
+def test_second_incremental_run_reuses_ledger(tmp_path):
+    job_dir = str(tmp_path / "job_dir")
+    working_dir = str(tmp_path / "out")
+    os.makedirs(working_dir)
+    experiment_id = generate_tree(
+        job_dir, n_ds=2, n_samples=2, n_seeds=1, events_per_year=20
+    )
+    simulations = list_simulations(find_experiment_dir(job_dir, experiment_id))
+
+    first = event_reporter(working_dir)
+    LocalAnalyzeManager(
+        job_dir=job_dir, ids=[experiment_id], analyzers=[first]
+    ).analyze()
+    output = pd.read_csv(first.output_path())
+    shards = {
+        f.path: f.stat().st_mtime_ns
+        for f in os.scandir(first.ledger_dir())
+        if f.name.endswith(".pkl")
+    }
+
+    second = event_reporter(working_dir)
+    assert not any(second.filter(s) for s in simulations)
+    LocalAnalyzeManager(
+        job_dir=job_dir, ids=[experiment_id], analyzers=[second]
+    ).analyze()
+
+    assert {path: os.stat(path).st_mtime_ns for path in shards} == shards
+    assert len(shards) == len(simulations)
+    pd.testing.assert_frame_equal(pd.read_csv(second.output_path()), output)
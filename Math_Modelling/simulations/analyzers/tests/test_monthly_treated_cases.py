@@ -0,0 +1,120 @@
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("idmtools")
+
+from simulation_emodpy.analyzer.analyzer_collection import (  # noqa: E402
+    MonthlyTreatedCasesAnalyzer,
+)
+from simulation_emodpy.analyzer.benchmark_analyzers import (  # noqa: E402
+    generate_tree,
+)
+from simulation_emodpy.analyzer.local_analyze import (  # noqa: E402
+    LocalAnalyzeManager,
+    find_experiment_dir,
+    list_simulations,
+)
+
+START_YEAR, END_YEAR = 2023, 2026
+SWEEP_VARIABLES = ["Sample_ID", "DS_Name", "archetype", "Run_Number"]
+CHANNELS = [
+    "Received_Treatment",
+    "Received_Severe_Treatment",
+    "Received_NMF_Treatment",
+]
+INSET_CHANNELS = [
+    "Statistical Population",
+    "New Clinical Cases",
+    "New Severe Cases",
+    "PfHRP2 Prevalence",
+]
+SUM_CHANNELS = [
+    "Received_Treatment",
+    "Received_Severe_Treatment",
+    "New Clinical Cases",
+    "New Severe Cases",
+    "Received_NMF_Treatment",
+]
+MEAN_CHANNELS = ["Statistical Population", "PfHRP2 Prevalence"]
+
+
+def baseline_treated_cases(counter_file, inset_file, tags):
+    """
+    Map of MonthlyTreatedCasesAnalyzer before the calendar was cached.
+    """
+    with open(counter_file) as f:
+        counter = json.load(f)
+    with open(inset_file) as f:
+        inset = json.load(f)
+
+    simdata = pd.DataFrame({x: inset["Channels"][x]["Data"] for x in INSET_CHANNELS})
+    simdata["Time"] = simdata.index
+    d = pd.DataFrame({x: counter["Channels"][x]["Data"] for x in CHANNELS})
+    d["Time"] = d.index
+    simdata = pd.merge(left=simdata, right=d, on="Time")
+
+    simdata["Month"] = (simdata["Time"] % 365 - 1) // 30 + 1
+    simdata["Year"] = simdata["Time"].apply(lambda x: int(x / 365) + START_YEAR)
+    simdata = simdata[simdata["Month"].isin(list(range(1, 13)))]
+    simdata["date"] = simdata.apply(
+        lambda x: datetime.date(int(x["Year"]), int(x["Month"]), 1), axis=1
+    )
+
+    df = simdata.groupby(["date"])[SUM_CHANNELS].agg("sum").reset_index()
+    pdf = simdata.groupby(["date"])[MEAN_CHANNELS].agg("mean").reset_index()
+    simdata = pd.merge(left=pdf, right=df, on=["date"])
+
+    for sweep_var in SWEEP_VARIABLES:
+        simdata[sweep_var] = tags[sweep_var]
+    return simdata
+
+
+def test_monthly_treated_cases_match_baseline(tmp_path):
+    job_dir = str(tmp_path / "job_dir")
+    working_dir = str(tmp_path / "out")
+    os.makedirs(working_dir)
+    experiment_id = generate_tree(
+        job_dir,
+        n_ds=2,
+        n_samples=2,
+        n_seeds=1,
+        start_year=START_YEAR,
+        end_year=END_YEAR,
+        events_per_year=10,
+    )
+    simulations = list_simulations(find_experiment_dir(job_dir, experiment_id))
+
+    analyzer = MonthlyTreatedCasesAnalyzer(
+        sweep_variables=SWEEP_VARIABLES,
+        working_dir=working_dir,
+        start_year=START_YEAR,
+    )
+    LocalAnalyzeManager(
+        job_dir=job_dir, ids=[experiment_id], analyzers=[analyzer]
+    ).analyze()
+    output = pd.read_csv(analyzer.output_path())
+
+    baseline = pd.concat(
+        baseline_treated_cases(
+            os.path.join(s.get_path(), analyzer.filenames[0]),
+            os.path.join(s.get_path(), analyzer.filenames[1]),
+            s.tags,
+        )
+        for s in simulations
+    ).reset_index(drop=True)
+    baseline["date"] = baseline["date"].astype(str)
+
+    assert list(output.columns) == list(baseline.columns)
+    assert len(output) == len(baseline) == len(simulations) * 12 * 3
+    keys = ["date"] + SWEEP_VARIABLES
+    pd.testing.assert_frame_equal(output[keys], baseline[keys])
+    np.testing.assert_allclose(
+        output[MEAN_CHANNELS + SUM_CHANNELS],
+        baseline[MEAN_CHANNELS + SUM_CHANNELS],
+        rtol=1e-12,
+    )
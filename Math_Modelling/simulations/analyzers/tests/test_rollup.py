@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from simulation_emodpy.analyzer.rollup import rollup_output
+
+
+def test_default_dims_ignore_unlisted_measures():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        [
+            {
+                "DS_Name": ds,
+                "archetype": "Sahel",
+                "Sample_ID": sample,
+                "Run_Number": 0,
+                "year": year,
+                "agebin": agebin,
+                "PfPR": rng.random(),
+                "Cases": rng.random(),
+                "Severe cases": rng.random(),
+                "Pop": rng.random(),
+            }
+            for ds in ["A", "B", "C"]
+            for sample in range(2)
+            for year in [2023, 2024]
+            for agebin in [5, 125]
+        ]
+    )
+    pop_df = pd.DataFrame(
+        {"DS_Name": ["A", "B", "C"], "Population_2016": [1, 2, 3], "PEC": [0, 0, 1]}
+    )
+
+    result = rollup_output(df, pop_df, by="PEC", rates=["PfPR"], counts=["Cases"])
+
+    keys = ["PEC", "Sample_ID", "Run_Number", "year", "agebin"]
+    assert list(result.columns) == keys + ["PfPR", "Cases"]
+    assert len(result) == 2 * 2 * 2 * 2
+
+    df["PEC"] = df["DS_Name"].map(pop_df.set_index("DS_Name")["PEC"])
+    df["weight"] = df["DS_Name"].map(pop_df.set_index("DS_Name")["Population_2016"])
+    df["weighted"] = df["PfPR"] * df["weight"]
+    expected = df.groupby(keys, as_index=False)[["weighted", "weight", "Cases"]].sum()
+    expected["PfPR"] = expected["weighted"] / expected["weight"]
+    np.testing.assert_allclose(result["PfPR"], expected["PfPR"])
+    np.testing.assert_allclose(result["Cases"], expected["Cases"])
@@ -0,0 +1,112 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("idmtools")
+
+from simulation_emodpy.analyzer.analyzer_collection import (  # noqa: E402
+    annualSevereTreatedByAgeAnalyzer,
+    read_event_recorder,
+)
+from simulation_emodpy.analyzer.benchmark_analyzers import (  # noqa: E402
+    event_recorder,
+    generate_tree,
+)
+from simulation_emodpy.analyzer.local_analyze import (  # noqa: E402
+    LocalAnalyzeManager,
+    find_experiment_dir,
+    list_simulations,
+)
+
+START_YEAR, END_YEAR = 2023, 2026
+SWEEP_VARIABLES = ["Sample_ID", "DS_Name", "archetype", "Run_Number"]
+EVENT_NAME = "Received_Severe_Treatment"
+
+
+def baseline_severe(report_file, tags, agebins):
+    """
+    Map of annualSevereTreatedByAgeAnalyzer before the counts were vectorized.
+    """
+    output_data = pd.read_csv(report_file)
+    output_data = output_data[output_data["Event_Name"] == EVENT_NAME]
+    output_data["year"] = output_data.loc[:, "Time"].apply(
+        lambda x: int(x / 365) + START_YEAR
+    )
+    output_data["age in years"] = output_data.loc[:, "Age"] / 365
+
+    list_of_g = []
+    for agemax in agebins:
+        d = output_data[
+            (output_data["age in years"] < agemax) & (output_data["age in years"] > 0)
+        ]
+        g = d.groupby(["year"])["Event_Name"].agg(len).reset_index()
+        g = g.rename(columns={"Event_Name": EVENT_NAME})
+        g["agebin"] = agemax
+        list_of_g.append(g)
+    simdata = pd.concat(list_of_g).reset_index(drop=True)
+
+    for sweep_var in SWEEP_VARIABLES:
+        simdata[sweep_var] = tags[sweep_var]
+    return simdata
+
+
+@pytest.mark.parametrize("agebins", [None, [0.5, 2, 5, 15, 125]])
+def test_severe_treated_matches_baseline(tmp_path, agebins):
+    job_dir = str(tmp_path / "job_dir")
+    working_dir = str(tmp_path / "out")
+    os.makedirs(working_dir)
+    experiment_id = generate_tree(
+        job_dir,
+        n_ds=2,
+        n_samples=2,
+        n_seeds=1,
+        start_year=START_YEAR,
+        end_year=END_YEAR,
+        events_per_year=400,
+    )
+    simulations = list_simulations(find_experiment_dir(job_dir, experiment_id))
+
+    analyzer = annualSevereTreatedByAgeAnalyzer(
+        sweep_variables=SWEEP_VARIABLES,
+        working_dir=working_dir,
+        start_year=START_YEAR,
+        event_name=EVENT_NAME,
+        agebins=agebins,
+    )
+    LocalAnalyzeManager(
+        job_dir=job_dir, ids=[experiment_id], analyzers=[analyzer]
+    ).analyze()
+    output = pd.read_csv(analyzer.output_path(), dtype=str)
+
+    baseline = pd.concat(
+        baseline_severe(
+            os.path.join(s.get_path(), analyzer.filenames[0]),
+            s.tags,
+            analyzer.agebins,
+        )
+        for s in simulations
+    )
+    baseline = pd.read_csv(io.StringIO(baseline.to_csv(index=False)), dtype=str)
+    pd.testing.assert_frame_equal(output, baseline)
+
+
+def test_chunked_recorder_matches_full_read():
+    recorder = event_recorder(np.random.default_rng(0), 3 * 365, 2000)
+    content = recorder.to_csv(index=False).encode()
+    usecols = ["Time", "Event_Name", "Age"]
+
+    df = read_event_recorder(
+        content,
+        usecols=usecols,
+        event_names=EVENT_NAME,
+        time_cutoff=100,
+        chunksize=1000,
+    )
+
+    expected = recorder[
+        (recorder["Event_Name"] == EVENT_NAME) & (recorder["Time"] >= 100)
+    ]
+    pd.testing.assert_frame_equal(df, expected[usecols].reset_index(drop=True))
@@ -1,18 +1,33 @@
+import argparse
+import sys
 from datetime import datetime as dt
+from pathlib import Path
 
 import config_params as par
 from idmtools.core.platform_factory import Platform
 from idmtools.entities import Suite
 from idmtools.entities.experiment import Experiment
 from idmtools.entities.templated_simulation import TemplatedSimulations
-from task_and_builders import get_sweep_builders, get_task
+from task_and_builders import (get_ds_list, get_sweep_builders, get_task,
+                               load_sweep_inputs)
 import emod_api.schema_to_class as s2c
 
 import manifest
 
+# Sweep helpers shared by the simulation folders
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from sweep_utils import ParallelSweepBuilder  # noqa: E402
+
 s2c.show_warnings = False
 
 
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-workers", dest="workers", type=int, default=0)
+
+    return parser.parse_args()
+
+
 def _print_params():
     """
     Just a useful convenient function for the user.
@@ -39,6 +54,15 @@ def _post_run(experiment: Experiment, **kwargs):
     pass
 
 
+def _get_task(**kwargs):
+    task = get_task(**kwargs)
+
+    if manifest.SIF_PATH:
+        task.sif_path = manifest.SIF_PATH
+
+    return task
+
+
 def _config_experiment(**kwargs):
     """
     Build experiment from task and builder. task is EMODTask. builder is
@@ -46,12 +70,14 @@ def _config_experiment(**kwargs):
     Return:
         experiment
     """
-
-    builders = get_sweep_builders(**kwargs)
-    task = get_task(**kwargs)
-
-    if manifest.SIF_PATH:
-        task.sif_path = manifest.SIF_PATH
+    if kwargs.get("workers"):
+        # The tables are read once here and inherited by the build workers
+        kwargs["inputs"] = load_sweep_inputs(**kwargs)
+        builders = [ParallelSweepBuilder(_get_task, get_sweep_builders,
+                                         get_ds_list(**kwargs), **kwargs)]
+    else:
+        builders = get_sweep_builders(**kwargs)
+    task = _get_task(**kwargs)
 
     ts = TemplatedSimulations(base_task=task, builders=builders)
     experiment = Experiment.from_template(ts, name=par.expname)
@@ -86,6 +112,8 @@ def run_experiment(**kwargs):
 
 
 if __name__ == "__main__":
+    args = parse_args()
+
     # platform = Platform('CALCULON')
     # platform = Platform('IDMCLOUD')
 
@@ -107,4 +135,4 @@ if __name__ == "__main__":
     # dtk.setup(pathlib.Path(manifest.eradication_path).parent)
     # os.chdir(os.path.dirname(__file__))
     # print("...done.")
-    run_experiment()
+    run_experiment(workers=args.workers)
@@ -1,4 +1,5 @@
 import os
+import sys
 from functools import partial
 from pathlib import Path
 from typing import List
@@ -8,7 +9,6 @@ import pandas as pd
 from emodpy import emod_task
 from emodpy_malaria.interventions.outbreak import add_outbreak_individual
 from emodpy_malaria.reporters.builtin import add_report_event_counter
-from idmtools.builders import SimulationBuilder
 from idmtools.entities.simulation import Simulation
 from scipy import interpolate
 from snt.hbhi.set_up_general import setup_ds
@@ -20,6 +20,10 @@ from tqdm import tqdm
 
 import manifest
 
+# Sweep helpers shared by the simulation folders
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from sweep_utils import LazySweepBuilder, memoize_campaign  # noqa: E402
+
 platform = None
 
 #####################################
@@ -238,12 +242,18 @@ def tagger(simulation, param, value):
     return {param: value}
 
 
-def get_sweep_builders(**kwargs):
-    global platform
-    platform = kwargs.get('platform', None)
+def get_ds_list(**kwargs):
+    '''
+    DS simulated, in the order of the sweep
+    '''
+    return list(par.ds_list)
 
-    builder = SimulationBuilder()
 
+def load_sweep_inputs(**kwargs):
+    '''
+    Read the tables the sweep is built from. A parallel build reads them once
+    in the parent and passes them to the workers as inputs=.
+    '''
     # Treatment-seeking
     hs_df = tryread_df(os.path.join(manifest.IO_DIR, 'simulation_inputs',
                                     '_scenarios_2023', 'cm_2005-2022.csv'))
@@ -260,82 +270,109 @@ def get_sweep_builders(**kwargs):
     smc_df['coverage_low_access_o5'] = 0
 
     # Important DFs
-    master_df = par.master_df
     lhdf = pd.read_csv(os.path.join(manifest.IO_DIR, par.larval_hab_csv))
     rel_abund_df = pd.read_csv(os.path.join(manifest.IO_DIR, par.rel_abund_csv))
     rel_abund_df = rel_abund_df.set_index('DS_Name')
 
+    return {'hs_df': hs_df, 'itn_df': itn_df, 'smc_df': smc_df,
+            'lhdf': lhdf, 'rel_abund_df': rel_abund_df}
+
+
+def get_sweep_builders(**kwargs):
+    global platform
+    platform = kwargs.get('platform', None)
+    inputs = kwargs.get('inputs') or load_sweep_inputs(**kwargs)
+
+    hs_df = inputs['hs_df']
+    itn_df = inputs['itn_df']
+    smc_df = inputs['smc_df']
+
+    # Important DFs
+    master_df = par.master_df
+    lhdf = inputs['lhdf']
+    rel_abund_df = inputs['rel_abund_df']
+
     samp_df = par.samp_df
-    ds_list = par.ds_list
+    ds_list = get_ds_list(**kwargs)
+    ds_subset = kwargs.get('ds_subset')
+    if ds_subset is not None:
+        ds_list = [ds for ds in ds_list if ds in ds_subset]
 
     # BUILDER
     int_suite = par.int_suite
-    int_sweeps = []
-    for my_ds in tqdm(ds_list):
-        samp_ds = samp_df[samp_df.DS_Name == my_ds].copy()
-        for r, row in samp_ds.iterrows():
-            hs_ds = hs_df.copy()[hs_df[int_suite.hs_ds_col] == my_ds]
-            full_covs = lin_interpolate([2005, 2012, 2018, 2021, 2022],
-                                        [0, row['CM_cov_2012'], row['CM_cov_2018'],
-                                         row['CM_cov_2021'], row['CM_cov_2021']])
-            hs_ds['U5_coverage'] = full_covs * hs_ds['U5_coverage']
-            hs_ds['adult_coverage'] = full_covs * hs_ds['adult_coverage']
-            hs_ds['severe_cases'] = hs_ds['U5_coverage'] * 1.4
-            hs_ds['severe_cases'] = [1 if x > 1 else x for x in hs_ds['severe_cases']]
-            hs_ds['severe_cases'] = [0.6 if x < 0.6 else x for x in hs_ds['severe_cases']]
-
-            itn_ds = itn_df.copy()[itn_df[int_suite.itn_ds_col] == my_ds]
-            itn_ds = itn_ds[itn_ds['year'] <= 2022]
-            itn_ds = itn_ds.reset_index()
-
-            # TODO: Make code below more defensive
-            itn_ds.loc[0, int_suite.itn_cov_cols] = itn_ds.loc[0, int_suite.itn_cov_cols] * row['ITN_2013']
-            itn_ds.loc[1, int_suite.itn_cov_cols] = itn_ds.loc[1, int_suite.itn_cov_cols] * row['ITN_2016']
-            itn_ds.loc[2, int_suite.itn_cov_cols] = itn_ds.loc[2, int_suite.itn_cov_cols] * row['ITN_2019']
-            itn_ds.loc[3, int_suite.itn_cov_cols] = itn_ds.loc[3, int_suite.itn_cov_cols] * row['ITN_2019']
-            for col in int_suite.itn_cov_cols:
-                itn_ds.loc[:, col] = [x if x < 1 else 1 for x in itn_ds.loc[:, col]]
-
-            cnf = CfgFn(setup_ds,
-                        manifest=manifest,
-                        platform=platform,
-                        my_ds=my_ds,
-                        archetype_ds=master_df.at[my_ds, 'seasonality_archetype_2'],
-                        pull_from_serialization=par.pull_from_serialization,
-                        burnin_id=par.burnin_id,
-                        ser_date=par.ser_date,
-                        rel_abund_df=rel_abund_df,
-                        lhdf=lhdf,
-                        demographic_suffix=par.demographic_suffix,
-                        climate_prefix=par.climate_prefix,
-                        climate_suffix=par.climate_suffix,
-                        use_arch_burnin=par.use_arch_burnin,
-                        use_arch_input=par.use_arch_input,
-                        hab_multiplier=row['Habitat_Multiplier'],
-                        serialize_match_tag=['Habitat_Multiplier'],
-                        serialize_match_val=[float(row['Habitat_Multiplier'])])
-            int_f = ItvFn(add_all_interventions,
-                          int_suite=int_suite,
-                          my_ds=my_ds,
-                          hs_df=hs_ds,
-                          itn_df=itn_ds,
-                          smc_df=smc_df,
-                          addtl_smc_func=update_smc_access_ips  # Change IP every year
-                          )
-
-            for x in range(par.num_seeds):
-                int_funcs = []
-
-                int_funcs.append(cnf)
-                int_funcs.append(int_f)
-                #int_funcs.append(partial(tagger, param='DS_Name', value=my_ds))
-                int_funcs.append(partial(tagger, param='Sample_ID', value=row['id']))
-                int_funcs.append(partial(set_param, param='Run_Number', 
-                                         value=row['seed2'] + x))
-
-                int_sweeps.append(int_funcs)
-
-    builder.add_sweep_definition(sweep_interventions, int_sweeps)
+    # One memo for the sweep: seeds (and samples with the same arguments) reuse
+    # the campaign events of the previous simulation
+    add_interventions = memoize_campaign(add_all_interventions)
+    # Samples swept, in the order of the simulations
+    samp_sweep = samp_df[samp_df.DS_Name.isin(ds_list)]
+
+    def int_sweeps():
+        for my_ds in tqdm(ds_list):
+            samp_ds = samp_sweep[samp_sweep.DS_Name == my_ds].copy()
+            for r, row in samp_ds.iterrows():
+                hs_ds = hs_df.copy()[hs_df[int_suite.hs_ds_col] == my_ds]
+                full_covs = lin_interpolate([2005, 2012, 2018, 2021, 2022],
+                                            [0, row['CM_cov_2012'], row['CM_cov_2018'],
+                                             row['CM_cov_2021'], row['CM_cov_2021']])
+                hs_ds['U5_coverage'] = full_covs * hs_ds['U5_coverage']
+                hs_ds['adult_coverage'] = full_covs * hs_ds['adult_coverage']
+                hs_ds['severe_cases'] = hs_ds['U5_coverage'] * 1.4
+                hs_ds['severe_cases'] = [1 if x > 1 else x for x in hs_ds['severe_cases']]
+                hs_ds['severe_cases'] = [0.6 if x < 0.6 else x for x in hs_ds['severe_cases']]
+
+                itn_ds = itn_df.copy()[itn_df[int_suite.itn_ds_col] == my_ds]
+                itn_ds = itn_ds[itn_ds['year'] <= 2022]
+                itn_ds = itn_ds.reset_index()
+
+                # TODO: Make code below more defensive
+                itn_ds.loc[0, int_suite.itn_cov_cols] = itn_ds.loc[0, int_suite.itn_cov_cols] * row['ITN_2013']
+                itn_ds.loc[1, int_suite.itn_cov_cols] = itn_ds.loc[1, int_suite.itn_cov_cols] * row['ITN_2016']
+                itn_ds.loc[2, int_suite.itn_cov_cols] = itn_ds.loc[2, int_suite.itn_cov_cols] * row['ITN_2019']
+                itn_ds.loc[3, int_suite.itn_cov_cols] = itn_ds.loc[3, int_suite.itn_cov_cols] * row['ITN_2019']
+                for col in int_suite.itn_cov_cols:
+                    itn_ds.loc[:, col] = [x if x < 1 else 1 for x in itn_ds.loc[:, col]]
+
+                cnf = CfgFn(setup_ds,
+                            manifest=manifest,
+                            platform=platform,
+                            my_ds=my_ds,
+                            archetype_ds=master_df.at[my_ds, 'seasonality_archetype_2'],
+                            pull_from_serialization=par.pull_from_serialization,
+                            burnin_id=par.burnin_id,
+                            ser_date=par.ser_date,
+                            rel_abund_df=rel_abund_df,
+                            lhdf=lhdf,
+                            demographic_suffix=par.demographic_suffix,
+                            climate_prefix=par.climate_prefix,
+                            climate_suffix=par.climate_suffix,
+                            use_arch_burnin=par.use_arch_burnin,
+                            use_arch_input=par.use_arch_input,
+                            hab_multiplier=row['Habitat_Multiplier'],
+                            serialize_match_tag=['Habitat_Multiplier'],
+                            serialize_match_val=[float(row['Habitat_Multiplier'])])
+                int_f = ItvFn(add_interventions,
+                              int_suite=int_suite,
+                              my_ds=my_ds,
+                              hs_df=hs_ds,
+                              itn_df=itn_ds,
+                              smc_df=smc_df,
+                              addtl_smc_func=update_smc_access_ips  # Change IP every year
+                              )
+
+                for x in range(par.num_seeds):
+                    int_funcs = []
+
+                    int_funcs.append(cnf)
+                    int_funcs.append(int_f)
+                    #int_funcs.append(partial(tagger, param='DS_Name', value=my_ds))
+                    int_funcs.append(partial(tagger, param='Sample_ID', value=row['id']))
+                    int_funcs.append(partial(set_param, param='Run_Number', 
+                                             value=row['seed2'] + x))
+
+                    yield int_funcs
+
+    builder = LazySweepBuilder(sweep_interventions, int_sweeps,
+                               count=len(samp_sweep) * par.num_seeds)
     print(builder.count)
 
     return [builder]
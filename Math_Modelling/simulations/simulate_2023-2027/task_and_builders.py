@@ -1,14 +1,18 @@
 import os
+import pickle
+import sys
+import tempfile
+from collections import defaultdict
 from functools import partial
 from pathlib import Path
 from typing import List
 
 import config_params as par
+import numpy as np
 import pandas as pd
 from emodpy import emod_task
 from emodpy_malaria.interventions.outbreak import add_outbreak_individual
 from emodpy_malaria.reporters.builtin import add_report_event_counter
-from idmtools.builders import SimulationBuilder
 from idmtools.entities.simulation import Simulation
 from scipy import interpolate
 from snt.hbhi.set_up_general import setup_ds
@@ -24,6 +28,10 @@ from tqdm import tqdm
 
 import manifest
 
+# Sweep helpers shared by the simulation folders
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from sweep_utils import LazySweepBuilder, memoize_campaign  # noqa: E402
+
 platform = None
 
 #####################################
@@ -241,12 +249,153 @@ def tagger(simulation, param, value):
     return {param: value}
 
 
-def get_sweep_builders(**kwargs):
-    global platform
-    platform = kwargs.get('platform', None)
-    scen = kwargs.get('scen')
+def split_by_ds(df, ds_col='DS_Name'):
+    '''
+    Split an intervention table once into per-DS slices, so each simulation
+    only carries (and re-filters) the rows of its own DS. DS without rows get
+    an empty frame with the same columns; tables without ds_col are shared.
+    '''
+    if ds_col not in df.columns:
+        return defaultdict(lambda: df)
+    empty = df.iloc[0:0]
+    return defaultdict(lambda: empty,
+                       {ds: ds_df for ds, ds_df in df.groupby(ds_col, sort=False)})
+
+
+# Tags matching a simulation to its serialized population in the burnin
+SERIALIZE_MATCH_TAG = ['Sample_ID', 'Run_Number']
 
-    builder = SimulationBuilder()
+
+def _index_key(values):
+    '''
+    Key of the burnin index, with numbers normalized so that e.g. a Run_Number
+    of 3, 3.0 or np.int64(3) match.
+    '''
+    key = []
+    for v in values:
+        if isinstance(v, (int, np.integer)) and not isinstance(v, bool):
+            v = int(v)
+        elif isinstance(v, (float, np.floating)) and float(v).is_integer():
+            v = int(v)
+        key.append(v)
+    return tuple(key)
+
+
+def load_burnin_index(burnin_csv, match_tags, ds_col='DS_Name'):
+    '''
+    Load a burnin table (one row per serialized population) with its index
+    from (DS, *match tag values) to row. The table and index are saved beside
+    the csv with a .pkl extension, stamped with the size and mtime of the csv,
+    and only rebuilt when the csv changes. DS is left out of the key if the
+    table has no ds_col.
+
+    Returns:
+        (burnin_df, index)
+    '''
+    stat = os.stat(burnin_csv)
+    stamp = (stat.st_size, stat.st_mtime_ns, tuple(match_tags), ds_col)
+    index_file = f'{os.path.splitext(burnin_csv)[0]}.pkl'
+    if os.path.exists(index_file):
+        with open(index_file, 'rb') as f:
+            saved = pickle.load(f)
+        if len(saved) == 3 and saved[0] == stamp:
+            return saved[1], saved[2]
+
+    burnin_df = pd.read_csv(burnin_csv)
+    key_cols = ([ds_col] if ds_col in burnin_df.columns else []) + list(match_tags)
+    index = {}
+    for row, values in enumerate(burnin_df[key_cols].itertuples(index=False, name=None)):
+        # Like filtering the table, the first matching population is used
+        index.setdefault(_index_key(values), row)
+
+    # Written aside and renamed, so a concurrent reader never sees half a file
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_file)),
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((stamp, burnin_df, index), f)
+        os.replace(tmp_file, index_file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+
+    return burnin_df, index
+
+
+def load_burnin(match_tags=SERIALIZE_MATCH_TAG):
+    '''
+    Table of the succeeded simulations of the burnin experiment, from its
+    cached experiment index instead of platform.create_sim_directory_df,
+    loaded with its index (see load_burnin_index). The table is written to
+    {burnin_id}_index.csv, and only rewritten when the burnin simulations
+    changed, so the saved index stays valid. If the experiment is not in the
+    job directory, the hand-maintained {burnin_id}.csv is used instead.
+
+    Called by load_sweep_inputs, once per build.
+
+    Returns:
+        (burnin_df, index)
+    '''
+    # Imported here, as it loads the analyzers package (and pyarrow)
+    from simulation_emodpy.analyzer.experiment_index import simulation_directory_df
+
+    try:
+        burnin_sims = simulation_directory_df(manifest.job_dir, par.burnin_id)
+    except FileNotFoundError:
+        burnin_csv = f'{par.burnin_id}.csv'
+        if not os.path.exists(burnin_csv):
+            raise
+        print(f'{par.burnin_id} not found in {manifest.job_dir}, using {burnin_csv}')
+        return load_burnin_index(burnin_csv, match_tags)
+
+    # Failed or unfinished burnins have no population to pick up
+    burnin_sims = burnin_sims[burnin_sims['status'].astype(str).eq('0')]
+    burnin_csv = f'{par.burnin_id}_index.csv'
+    content = burnin_sims.to_csv(index=False)
+    current = None
+    if os.path.exists(burnin_csv):
+        with open(burnin_csv) as f:
+            current = f.read()
+    if content != current:
+        with open(burnin_csv, 'w') as f:
+            f.write(content)
+
+    return load_burnin_index(burnin_csv, match_tags)
+
+
+def burnin_key(index_has_ds, burnin_ds, match_vals):
+    return _index_key(([burnin_ds] if index_has_ds else []) + list(match_vals))
+
+
+def get_ds_list(**kwargs):
+    '''
+    DS simulated in the scenario, in the order of the sweep
+    '''
+    scen_row = par.scen_df.loc[kwargs.get('scen'), :]
+    master_df = par.master_df
+
+    # Subsetting DSes (Not subsetting yet...)
+    ds_list = par.samp_df.DS_Name.unique()
+    if not pd.isna(scen_row['smcsubset']):
+        ds_list = master_df[master_df['CPS'] == scen_row['smcsubset']].index
+    elif scen_row['pmcsubset'] == 'yes':
+        ds_list = master_df[master_df['CPP'] == 'CPP'].index
+    elif scen_row['pmcsubset'] == 'Yomou':
+        ds_list = ['Yomou']
+    elif not pd.isna(scen_row['llinsubset']):
+        ds_list = master_df[master_df['MILDA'] == scen_row['llinsubset']].index
+
+    return list(ds_list)
+
+
+def load_sweep_inputs(**kwargs):
+    '''
+    Read the tables the sweep is built from: intervention tables split by DS,
+    habitat and vector abundance tables and the burnin table with its index.
+    A parallel build reads them once in the parent and passes them to the
+    workers as inputs=.
+    '''
+    scen = kwargs.get('scen')
     scen_row = par.scen_df.loc[scen, :]
 
     # Treatment-seeking
@@ -272,74 +421,135 @@ def get_sweep_builders(**kwargs):
     rtss_df = tryread_df(os.path.join(par.scenariopath, 'rtss', f"{scen_row['RTSS']}.csv"))
 
     # Important DFs
-    master_df = par.master_df
     lhdf = pd.read_csv(os.path.join(manifest.IO_DIR, par.larval_hab_csv))
     rel_abund_df = pd.read_csv(os.path.join(manifest.IO_DIR, par.rel_abund_csv))
     rel_abund_df = rel_abund_df.set_index('DS_Name')
 
-    samp_df = par.samp_df
-    
     # Option to prebuild burnin df instead of letting setup_ds handle it
-    burnin_df = pd.read_csv(f'{par.burnin_id}.csv')
-    #burnin_df = platform.create_sim_directory_df(par.burnin_id)
+    burnin_df, burnin_index = load_burnin(SERIALIZE_MATCH_TAG)
 
-    # Subsetting DSes (Not subsetting yet...)
-    ds_list = samp_df.DS_Name.unique()
-    if not pd.isna(scen_row['smcsubset']):
-        ds_list = master_df[master_df['CPS'] == scen_row['smcsubset']].index
-    elif scen_row['pmcsubset'] == 'yes':
-        ds_list = master_df[master_df['CPP'] == 'CPP'].index
-    elif scen_row['pmcsubset'] == 'Yomou':
-        ds_list = ['Yomou']
-    elif not pd.isna(scen_row['llinsubset']):
-        ds_list = master_df[master_df['MILDA'] == scen_row['llinsubset']].index
+    int_suite = par.int_suite
+    return {
+        'hs_by_ds': split_by_ds(hs_df, int_suite.hs_ds_col),
+        'itn_by_ds': split_by_ds(itn_df, int_suite.itn_ds_col),
+        'smc_by_ds': split_by_ds(smc_df, getattr(int_suite, 'smc_ds_col', 'DS_Name')),
+        'pmc_by_ds': split_by_ds(pmc_df, getattr(int_suite, 'pmc_ds_col', 'DS_Name')),
+        'rtss_by_ds': split_by_ds(rtss_df, getattr(int_suite, 'rtss_ds_col', 'DS_Name')),
+        'lhdf': lhdf,
+        'rel_abund_df': rel_abund_df,
+        'burnin_df': burnin_df,
+        'burnin_index': burnin_index,
+    }
+
+
+def get_sweep_builders(**kwargs):
+    global platform
+    platform = kwargs.get('platform', None)
+    inputs = kwargs.get('inputs') or load_sweep_inputs(**kwargs)
+
+    master_df = par.master_df
+    lhdf = inputs['lhdf']
+    rel_abund_df = inputs['rel_abund_df']
+    samp_df = par.samp_df
+
+    # Each simulation gets its own row of the burnin table, looked up in the index
+    serialize_match_tag = SERIALIZE_MATCH_TAG
+    burnin_df, burnin_index = inputs['burnin_df'], inputs['burnin_index']
+    index_has_ds = 'DS_Name' in burnin_df.columns
+
+    # Subsetting DSes, e.g. to the DS of one shard of a parallel build
+    ds_list = get_ds_list(**kwargs)
+    ds_subset = kwargs.get('ds_subset')
+    if ds_subset is not None:
+        ds_list = [ds for ds in ds_list if ds in ds_subset]
 
     # BUILDER
     int_suite = par.int_suite
-    int_sweeps = []
-    for my_ds in tqdm(ds_list):
-        samp_ds = samp_df[samp_df.DS_Name == my_ds].copy()
-        for r, row in samp_ds.iterrows():
-            int_f = ItvFn(add_all_interventions,
-                          int_suite=int_suite,
-                          my_ds=my_ds,
-                          hs_df=hs_df,
-                          itn_df=itn_df,
-                          smc_df=smc_df,
-                          pmc_df=pmc_df,
-                          rtss_df=rtss_df,
-                          addtl_smc_func=update_smc_access_ips  # Change IP every year
-                          )
+    hs_by_ds = inputs['hs_by_ds']
+    itn_by_ds = inputs['itn_by_ds']
+    smc_by_ds = inputs['smc_by_ds']
+    pmc_by_ds = inputs['pmc_by_ds']
+    rtss_by_ds = inputs['rtss_by_ds']
+    # One memo for the sweep: seeds (and samples with the same arguments) reuse
+    # the campaign events of the previous simulation
+    add_interventions = memoize_campaign(add_all_interventions)
+
+    # Samples swept, in the order of the simulations
+    samp_sweep = samp_df[samp_df.DS_Name.isin(ds_list)]
+
+    def serialize_match_val(row, x):
+        return [row['id'], row['seed2'] + x % par.ser_num_seeds]
+
+    def burnin_ds(my_ds):
+        if par.use_arch_burnin:
+            return master_df.at[my_ds, 'seasonality_archetype_2']
+        return my_ds
+
+    # Check that every simulation has its serialized population before any is built
+    if par.pull_from_serialization:
+        missing = []
+        for _, row in samp_sweep.iterrows():
             for x in range(par.num_seeds):
-                cnf = CfgFn(setup_ds,
-                            manifest=manifest,
-                            platform=platform,
-                            my_ds=my_ds,
-                            archetype_ds=master_df.at[my_ds, 'seasonality_archetype_2'],
-                            pull_from_serialization=par.pull_from_serialization,
-                            burnin_df=burnin_df,
-                            ser_date=par.ser_date,
-                            rel_abund_df=rel_abund_df,
-                            lhdf=lhdf,
-                            demographic_suffix=par.demographic_suffix,
-                            climate_prefix=par.climate_prefix,
-                            climate_suffix=par.climate_suffix,
-                            use_arch_burnin=par.use_arch_burnin,
-                            use_arch_input=par.use_arch_input,
-                            hab_multiplier=row['Habitat_Multiplier'],
-                            serialize_match_tag=['Sample_ID', 'Run_Number'],
-                            serialize_match_val=[row['id'], row['seed2'] + x % par.ser_num_seeds])
-
-                int_funcs = []
-                int_funcs.append(cnf)
-                int_funcs.append(int_f)
-                int_funcs.append(partial(tagger, param='Sample_ID', value=row['id']))
-                int_funcs.append(partial(set_param, param='Run_Number', 
-                                         value=row['seed2'] + x))
-
-                int_sweeps.append(int_funcs)
-
-    builder.add_sweep_definition(sweep_interventions, int_sweeps)
+                match_val = serialize_match_val(row, x)
+                key = burnin_key(index_has_ds, burnin_ds(row['DS_Name']), match_val)
+                if key not in burnin_index:
+                    missing.append((row['DS_Name'], *match_val))
+        if missing:
+            raise ValueError(f'{len(missing)} simulations have no succeeded burnin '
+                             f'in {par.burnin_id}, e.g. (DS_Name, '
+                             f'{", ".join(serialize_match_tag)}) = {missing[:5]}')
+
+    def int_sweeps():
+        for my_ds in tqdm(ds_list):
+            samp_ds = samp_sweep[samp_sweep.DS_Name == my_ds].copy()
+            for r, row in samp_ds.iterrows():
+                int_f = ItvFn(add_interventions,
+                              int_suite=int_suite,
+                              my_ds=my_ds,
+                              hs_df=hs_by_ds[my_ds],
+                              itn_df=itn_by_ds[my_ds],
+                              smc_df=smc_by_ds[my_ds],
+                              pmc_df=pmc_by_ds[my_ds],
+                              rtss_df=rtss_by_ds[my_ds],
+                              addtl_smc_func=update_smc_access_ips  # Change IP every year
+                              )
+                for x in range(par.num_seeds):
+                    match_val = serialize_match_val(row, x)
+                    key = burnin_key(index_has_ds, burnin_ds(my_ds), match_val)
+                    if key in burnin_index:
+                        burnin_row = burnin_df.iloc[[burnin_index[key]]]
+                    else:
+                        burnin_row = burnin_df.iloc[0:0]
+                    cnf = CfgFn(setup_ds,
+                                manifest=manifest,
+                                platform=platform,
+                                my_ds=my_ds,
+                                archetype_ds=master_df.at[my_ds, 'seasonality_archetype_2'],
+                                pull_from_serialization=par.pull_from_serialization,
+                                burnin_df=burnin_row,
+                                ser_date=par.ser_date,
+                                rel_abund_df=rel_abund_df,
+                                lhdf=lhdf,
+                                demographic_suffix=par.demographic_suffix,
+                                climate_prefix=par.climate_prefix,
+                                climate_suffix=par.climate_suffix,
+                                use_arch_burnin=par.use_arch_burnin,
+                                use_arch_input=par.use_arch_input,
+                                hab_multiplier=row['Habitat_Multiplier'],
+                                serialize_match_tag=serialize_match_tag,
+                                serialize_match_val=match_val)
+
+                    int_funcs = []
+                    int_funcs.append(cnf)
+                    int_funcs.append(int_f)
+                    int_funcs.append(partial(tagger, param='Sample_ID', value=row['id']))
+                    int_funcs.append(partial(set_param, param='Run_Number', 
+                                             value=row['seed2'] + x))
+
+                    yield int_funcs
+
+    builder = LazySweepBuilder(sweep_interventions, int_sweeps,
+                               count=len(samp_sweep) * par.num_seeds)
     print(builder.count)
 
     return [builder]
@@ -0,0 +1,230 @@
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, wraps
+from itertools import islice
+
+from idmtools.builders import SimulationBuilder
+from idmtools.entities.templated_simulation import TemplatedSimulations
+
+#####################################
+# Campaign memoization
+#####################################
+
+# emod_api.campaign state that intervention functions add to besides the events
+CAMPAIGN_STATE = ['pubsub_signals_subbing', 'pubsub_signals_pubbing', 'adhocs',
+                  'event_map', 'custom_coordinator_events', 'custom_node_events',
+                  'implicits', 'trigger_list']
+
+
+def _same_arg(a, b):
+    '''
+    Arguments match if they are the same object (e.g. the data frames held by
+    an ItvFn) or equal plain values.
+    '''
+    if a is b:
+        return True
+    return isinstance(a, (str, int, float)) and type(a) is type(b) and a == b
+
+
+def _same_args(call, other):
+    (args, kwargs), (other_args, other_kwargs) = call, other
+    return (len(args) == len(other_args) and kwargs.keys() == other_kwargs.keys()
+            and all(_same_arg(a, b) for a, b in zip(args, other_args))
+            and all(_same_arg(v, other_kwargs[k]) for k, v in kwargs.items()))
+
+
+def _state_diff(before, after):
+    if isinstance(after, dict):
+        return {k: v for k, v in after.items() if k not in before}
+    if isinstance(after, set):
+        return after - before
+    return [x for x in after if x not in before]
+
+
+def _state_merge(current, added):
+    if isinstance(current, (dict, set)):
+        current.update(added)
+    else:
+        current.extend(x for x in added if x not in current)
+
+
+def memoize_campaign(func):
+    """
+    Reuse the campaign events of an intervention function while it is called
+    with the same arguments. Simulations that share a DS and sample only differ
+    by Run_Number, so the seeds after the first get the events (and the event
+    triggers they register) of the first one by reference.
+
+    Only the last call is kept, with its arguments: the memo is dropped as soon
+    as the sweep moves on to the next DS or sample, and the arguments it holds
+    are never freed and reused while they key it.
+
+    Args:
+        func: intervention function called as func(campaign, *args, **kwargs),
+            e.g. add_all_interventions
+
+    Returns:
+        memoized function, with the name of func
+    """
+    last = {}
+
+    @wraps(func)
+    def memoized(campaign, *args, **kwargs):
+        call = (args, kwargs)
+        state = [name for name in CAMPAIGN_STATE
+                 if isinstance(getattr(campaign, name, None), (dict, set, list))]
+        if not last or not _same_args(call, last['call']):
+            last.clear()
+            n_events = len(campaign.campaign_dict['Events'])
+            before = {name: type(getattr(campaign, name))(getattr(campaign, name))
+                      for name in state}
+            tags = func(campaign, *args, **kwargs)
+            events = campaign.campaign_dict['Events'][n_events:]
+            added = {name: _state_diff(before[name], getattr(campaign, name))
+                     for name in state}
+            last.update(call=call, events=events, added=added, tags=tags)
+            return tags
+
+        campaign.campaign_dict['Events'].extend(last['events'])
+        for name, values in last['added'].items():
+            _state_merge(getattr(campaign, name), values)
+        tags = last['tags']
+        return dict(tags) if isinstance(tags, dict) else tags
+
+    return memoized
+
+
+#####################################
+# Builders
+#####################################
+
+class LazySweepBuilder(SimulationBuilder):
+    """
+    SimulationBuilder that yields the sweep of each simulation only when
+    TemplatedSimulations gets to it, so the CfgFn/ItvFn objects of the whole
+    experiment (and the data frames they hold) are never in memory at once.
+    Simulations are then created in the platform's batches as the sweep is
+    consumed.
+
+    Args:
+        function: sweep function called with (simulation, func_list)
+        sweeps: function returning a generator of func_list, one per simulation
+        count: number of simulations, known without running sweeps
+    """
+
+    def __init__(self, function, sweeps, count):
+        super().__init__()
+        self.function = function
+        self.int_sweeps = sweeps
+        self.count = count
+
+    @property
+    def count(self):
+        return self._count
+
+    @count.setter
+    def count(self, count):
+        self._count = count
+
+    def __iter__(self):
+        for func_list in self.int_sweeps():
+            yield [partial(self.function, func_list=func_list)]
+
+    def __len__(self):
+        return self.count
+
+
+#####################################
+# Parallel build
+#####################################
+
+# Set in the parent before the build workers are forked, so they inherit it
+_shard_state = {}
+
+
+def _build_shard(ds):
+    """
+    Build worker: run the sweep of one DS on the worker's task (created once
+    per worker) and return what each simulation adds to the template, its task
+    and tags, in the order of the sweep.
+    """
+    state = _shard_state
+    if 'task' not in state:
+        state['task'] = state['get_task'](**state['kwargs'])
+    builders = state['get_sweep_builders'](ds_subset=[ds], **state['kwargs'])
+    ts = TemplatedSimulations(base_task=state['task'], builders=builders)
+
+    return [(simulation.task, dict(simulation.tags)) for simulation in ts]
+
+
+def apply_built(simulation, task, tags):
+    simulation.task = task
+    return tags
+
+
+class ParallelSweepBuilder(SimulationBuilder):
+    """
+    SimulationBuilder that runs the sweep of each DS in a pool of forked
+    worker processes. The simulations are still created by the
+    TemplatedSimulations of the parent from its base task, and only take their
+    task and tags from the workers, in DS order, so the experiment is the same
+    as with the serial builders. At most 2 x workers DS are built ahead of the
+    simulations being created.
+
+    The workers are forked and inherit kwargs, so the tables the sweep is
+    built from are read once by the parent (e.g.
+    inputs=load_sweep_inputs(**kwargs)). Where fork is not available (macOS,
+    Windows), the serial builders are used instead.
+
+    Args:
+        get_task: function creating the task, called once per worker
+        get_sweep_builders: function returning the serial builders, called with
+            ds_subset=[DS] in the workers
+        ds_list: DS in the order of the sweep
+        workers: number of worker processes
+        kwargs: arguments of get_task and get_sweep_builders
+    """
+
+    def __init__(self, get_task, get_sweep_builders, ds_list, workers, **kwargs):
+        super().__init__()
+        self.get_task = get_task
+        self.get_sweep_builders = get_sweep_builders
+        self.ds_list = list(ds_list)
+        self.workers = workers
+        self.kwargs = kwargs
+        # Also checks the sweep (e.g. for missing burnin populations) up front
+        self.count = sum(len(b) for b in get_sweep_builders(**kwargs))
+
+    @property
+    def count(self):
+        return self._count
+
+    @count.setter
+    def count(self, count):
+        self._count = count
+
+    def __iter__(self):
+        if 'fork' not in mp.get_all_start_methods():
+            for builder in self.get_sweep_builders(**self.kwargs):
+                yield from builder
+            return
+
+        _shard_state.clear()
+        _shard_state.update(get_task=self.get_task,
+                            get_sweep_builders=self.get_sweep_builders,
+                            kwargs=self.kwargs)
+        ds_iter = iter(self.ds_list)
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=mp.get_context('fork')) as executor:
+            pending = deque(executor.submit(_build_shard, ds)
+                            for ds in islice(ds_iter, 2 * self.workers))
+            while pending:
+                built = pending.popleft().result()
+                pending.extend(executor.submit(_build_shard, ds)
+                               for ds in islice(ds_iter, 1))
+                for task, tags in built:
+                    yield [partial(apply_built, task=task, tags=tags)]
+
+    def __len__(self):
+        return self.count
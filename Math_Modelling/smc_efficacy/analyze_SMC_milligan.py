@@ -2,10 +2,90 @@ import pandas as pd
 import numpy as np
 import os
 import argparse
+import threading
+from collections import OrderedDict
 from simtools.Analysis.BaseAnalyzers import BaseAnalyzer
 import sys
 
 
+# Shared reader of the simulation analyzers, imported from report_readers.py
+# since analyzer_collection.py needs idmtools, not available with dtk-tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', 'simulations', 'analyzers'))
+from report_readers import read_summary_report  # noqa: E402
+
+
+# Parsed summary reports of the last simulations seen by this process, so the
+# analyzers reading the same report share one parse of it
+_report_cache = OrderedDict()
+_report_cache_size = 8
+_report_channels = {}
+_report_lock = threading.Lock()
+
+
+def load_summary_report(data, filename, simulation, channels, group='DataByTimeAndAgeBins'):
+    '''
+    reads the channels of a summary report once per simulation for all analyzers; the
+    first read of each report also reads the channels other analyzers asked for before
+    :param data: raw simulation data
+    :type data: dict
+    :param filename: report file name
+    :type filename: string
+    :param simulation: simulation the data belongs to
+    :param channels: names of the channels to read from group
+    :type channels: list
+    :param group: report section holding the channels
+    :type group: string
+    :return: report restricted to Metadata/Age Bins and the channels read
+    :rtype: dict
+    '''
+    content = data[filename]
+    key = (simulation.id, filename, len(content), group)
+    with _report_lock:
+        wanted = _report_channels.setdefault((filename, group), set())
+        wanted.update(channels)
+        report = _report_cache.get(key)
+        missing = [c for c in channels if report is None or c not in report[group]]
+        if not missing:
+            _report_cache.move_to_end(key)
+            return report
+        to_read = sorted(wanted) if report is None else missing
+
+    parsed = read_summary_report(content, to_read, group)
+    with _report_lock:
+        if report is not None:
+            report[group].update(parsed[group])
+            parsed = report
+        _report_cache[key] = parsed
+        _report_cache.move_to_end(key)
+        while len(_report_cache) > _report_cache_size:
+            _report_cache.popitem(last=False)
+    return parsed
+
+
+def to_long_format(values, time_name, times, value_name, ages):
+    '''
+    reshapes a (time, age) array into long format, one row per age and time
+    :param values: values by time (rows) and age (columns)
+    :type values: array
+    :param time_name: name of the time column
+    :type time_name: string
+    :param times: time of each row of values
+    :type times: array
+    :param value_name: name of the value column
+    :type value_name: string
+    :param ages: age label of each column of values
+    :type ages: list
+    :return: data frame with columns time_name, value_name and Age, ordered by age then time
+    :rtype: dataframe
+    '''
+    values = np.asarray(values)
+    n_times, n_ages = values.shape
+    return pd.DataFrame({time_name: np.tile(np.asarray(times), n_ages),
+                         value_name: values.T.ravel(),
+                         'Age': np.repeat(np.asarray(ages), n_times)})
+
+
 class CasesAvertedAnalyzer(BaseAnalyzer):
     '''
     this class defines the cases averted/efficacy analyzer
@@ -23,7 +103,8 @@ class CasesAvertedAnalyzer(BaseAnalyzer):
         '''
 
         super(CasesAvertedAnalyzer, self).__init__(working_dir=working_dir,
-                                                   filenames=["output/MalariaSummaryReport_Monthly_from_3498.json"])  # BF
+                                                   filenames=["output/MalariaSummaryReport_Monthly_from_3498.json"],  # BF
+                                                   parse=False)
         # filenames=["output/MalariaSummaryReport_5th_year_August.json"]) #kita
         self.sweep_variables = sweep_variables or ["SMC_Coverage"]
         self.exp_name = exp_name
@@ -45,20 +126,13 @@ class CasesAvertedAnalyzer(BaseAnalyzer):
         # print(data[self.filenames[0]])
         # Load last 2 years of data from simulation
         # output_data_df = pd.DataFrame(data[self.filenames[0]][self.data_channel_type][self.data_channels][:-1]) #grab from Aug 2015 -- start of SMC
-        output_data_df = pd.DataFrame(
-            data[self.filenames[0]][self.data_channel_type][self.data_channels])  # grab from Aug 2015 -- start of SMC
-        output_data_df.columns = ['Clinical_inc_0.25', 'Clinical_inc_5', 'Clinical_inc_100']
-        # output_data_df.columns = ['Clinical_inc_0.25', 'Clinical_inc_5', 'Clinical_inc_15', 'Clinical_inc_30','Clinical_inc_50','Clinical_inc_125']
-        output_data_df['Interval'] = output_data_df.index
+        report = load_summary_report(data, self.filenames[0], simulation, [self.data_channels],
+                                     self.data_channel_type)
+        values = report[self.data_channel_type][self.data_channels]  # grab from Aug 2015 -- start of SMC
 
         # reorient dataframe to long format
-        simdata = pd.DataFrame()
-        cols = [x for x in output_data_df.columns.values if 'inc' in x]
-        for col in cols:
-            sdf = output_data_df[['Interval', col]]
-            sdf = sdf.rename(columns={col: self.channel_name})
-            sdf['Age'] = col.split('_')[-1]
-            simdata = pd.concat([simdata, sdf])
+        simdata = to_long_format(values, 'Interval', np.arange(len(values)), self.channel_name,
+                                 ['0.25', '5', '100'])
 
         # add tags
         for sweep_var in self.sweep_variables:
@@ -131,6 +205,7 @@ class HRP2PrevalenceAnalyzer(BaseAnalyzer):
                 'Ref_HRP2_4_to_5': 0.58
             }
         }
+        self.survey_days = {'pre': 239, 'post': 604}
 
     def select_simulation_data(self, data, simulation):
 
@@ -138,21 +213,16 @@ class HRP2PrevalenceAnalyzer(BaseAnalyzer):
         output_data_df = pd.DataFrame(
             {channel: data[self.filenames[0]]['Channels'][channel]['Data'][-730:] for channel in self.data_channels})
         # remove dates when there were no prevalence surveys
-        output_data_df['day'] = output_data_df.index
         output_data_df = output_data_df[output_data_df[self.data_channels[0]] > 0]
         # calculate prevalence
-        for agebin in self.age_range:
-            output_data_df['Prevalence_Age_%s' % agebin] = output_data_df['Tested_Pos_Age_%s' % agebin] / \
-                                                           output_data_df['Received_Test_Age_%s' % agebin]
+        positive = output_data_df[['Tested_Pos_Age_%s' % x for x in self.age_range]].to_numpy()
+        tested = output_data_df[['Received_Test_Age_%s' % x for x in self.age_range]].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prevalence = positive / tested
 
         # reorient dataframe to long format
-        simdata = pd.DataFrame()
-        cols = [x for x in output_data_df.columns.values if 'Prevalence' in x]
-        for col in cols:
-            sdf = output_data_df[['day', col]]
-            sdf = sdf.rename(columns={col: self.channel_name})
-            sdf['Age'] = int(col.split('_')[-1]) - 1
-            simdata = pd.concat([simdata, sdf])
+        simdata = to_long_format(prevalence, 'day', output_data_df.index, self.channel_name,
+                                 list(self.ages))
 
         # add tags
         for sweep_var in self.sweep_variables:
@@ -168,34 +238,25 @@ class HRP2PrevalenceAnalyzer(BaseAnalyzer):
             print("\nNo data have been returned... Exiting...")
             return
         df = pd.concat(selected, sort=False).reset_index(drop=True)  # concat into dataframe
-        grouping_list = self.sweep_variables
-        grouping_list.append('Age')
-        grouping_list.insert(0, 'day')
+        grouping_list = ['day'] + self.sweep_variables + ['Age']
 
         df = df.groupby(grouping_list)['HRP2'].agg([np.min, np.mean, np.max]).reset_index()
         df = df.rename(columns={'amin': 'HRP2_min', 'mean': 'HRP2', 'amax': 'HRP2_max'})
         df = df.sort_values(by=grouping_list)
-        df['Ref_HRP2'] = 0
-        df['Distance'] = 0
-
-        ages = df['Age'].unique()
-        for ai in ages:
-            ref_pre = self.reference_dict['pre']['Ref_HRP2_%s_to_%s' % (ai, ai + 1)]
-            ref_post = self.reference_dict['post']['Ref_HRP2_%s_to_%s' % (ai, ai + 1)]
-            df.loc[((df['day'] == 239) & (df['Age'] == ai)), 'Ref_HRP2'] = ref_pre
-            df.loc[((df['day'] == 604) & (df['Age'] == ai)), 'Ref_HRP2'] = ref_post
-            df.loc[((df['day'] == 239) & (df['Age'] == ai)), 'Distance'] = np.sqrt(
-                (df.loc[((df['day'] == 239) & (df['Age'] == ai)), 'HRP2'] - ref_pre) ** 2)
-            df.loc[((df['day'] == 604) & (df['Age'] == ai)), 'Distance'] = np.sqrt(
-                (df.loc[((df['day'] == 604) & (df['Age'] == ai)), 'HRP2'] - ref_post) ** 2)
-
-        df['Total_distance'] = 0
-        samples = df['Sample_Number'].unique()
-        for si in samples:
-            df.loc[((df['Sample_Number'] == si) & (df['day'] == 239)), 'Total_distance'] = df.loc[
-                ((df['Sample_Number'] == si) & (df['day'] == 239)), 'Distance'].sum()
-            df.loc[((df['Sample_Number'] == si) & (df['day'] == 604)), 'Total_distance'] = df.loc[
-                ((df['Sample_Number'] == si) & (df['day'] == 604)), 'Distance'].sum()
+
+        # Reference prevalence of each survey (day, Age); 0 on the other days
+        ref = pd.DataFrame([(self.survey_days[period], int(key.split('_')[2]), value)
+                            for period, refs in self.reference_dict.items()
+                            for key, value in refs.items()],
+                           columns=['day', 'Age', 'Ref_HRP2'])
+        df['Ref_HRP2'] = df[['day', 'Age']].merge(ref, how='left')['Ref_HRP2'].fillna(0).to_numpy()
+        surveyed = df['day'].isin(list(self.survey_days.values()))
+        df['Distance'] = np.where(surveyed, np.sqrt((df['HRP2'] - df['Ref_HRP2']) ** 2), 0)
+
+        # Sum of the distances of each sample over the ages of each survey (Series.sum
+        # per group rather than the grouped 'sum', to add them up in the same order)
+        totals = df.groupby(['Sample_Number', 'day'])['Distance'].transform(lambda x: x.sum())
+        df['Total_distance'] = np.where(surveyed & df['Sample_Number'].notna(), totals, 0)
 
         # write to csv
         fn = os.path.join(self.working_dir, self.exp_name)
@@ -214,7 +275,8 @@ class PfPRAnalyzer(BaseAnalyzer):
 
         super(PfPRAnalyzer, self).__init__(working_dir=working_dir,
                                            filenames=[
-                                               "output/MalariaSummaryReport_Monthly_from_3498.json"])  # 3498 #3651
+                                               "output/MalariaSummaryReport_Monthly_from_3498.json"],  # 3498 #3651
+                                           parse=False)
         self.sweep_variables = sweep_variables or ["SMC_Coverage"]
         self.exp_name = exp_name
         self.data_channel_type = 'DataByTimeAndAgeBins'  # 'DataByTimeAndPfPRBinsAndAgeBins'
@@ -224,20 +286,13 @@ class PfPRAnalyzer(BaseAnalyzer):
     def select_simulation_data(self, data, simulation):
 
         # Load last 2 years of data from simulation
-        output_data_df = pd.DataFrame(data[self.filenames[0]][self.data_channel_type][self.data_channels][:-1])
-
-        # output_data_df = output_data_df[output_data_df[self.data_channels[0]] > 0]
-        output_data_df.columns = ['PfPR_0.25', 'PfPR_5', 'PfPR_100']
-        output_data_df['Interval'] = output_data_df.index
+        report = load_summary_report(data, self.filenames[0], simulation, [self.data_channels],
+                                     self.data_channel_type)
+        values = report[self.data_channel_type][self.data_channels][:-1]
 
         # reorient dataframe to long format
-        simdata = pd.DataFrame()
-        cols = [x for x in output_data_df.columns.values if 'PfPR' in x]
-        for col in cols:
-            sdf = output_data_df[['Interval', col]]
-            sdf = sdf.rename(columns={col: self.channel_name})
-            sdf['Age'] = col.split('_')[-1]
-            simdata = pd.concat([simdata, sdf])
+        simdata = to_long_format(values, 'Interval', np.arange(len(values)), self.channel_name,
+                                 ['0.25', '5', '100'])
 
         # add tags
         for sweep_var in self.sweep_variables:
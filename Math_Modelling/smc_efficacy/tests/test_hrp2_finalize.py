@@ -0,0 +1,98 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("simtools")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analyze_SMC_milligan import HRP2PrevalenceAnalyzer  # noqa: E402
+
+SWEEP_VARIABLES = ['SMC_Coverage', 'Sample_Number']
+
+
+class Simulation:
+    def __init__(self, id, tags):
+        self.id = id
+        self.tags = tags
+
+
+def baseline_finalize(analyzer, all_data, out_file):
+    '''
+    finalize of HRP2PrevalenceAnalyzer before the reference distances were
+    vectorized (columns started as 0.0, the dtype the assignments give them)
+    '''
+    selected = [data for sim, data in all_data.items()]
+    df = pd.concat(selected, sort=False).reset_index(drop=True)
+    grouping_list = list(analyzer.sweep_variables)
+    grouping_list.append('Age')
+    grouping_list.insert(0, 'day')
+
+    df = df.groupby(grouping_list)['HRP2'].agg([np.min, np.mean, np.max]).reset_index()
+    df = df.rename(columns={'amin': 'HRP2_min', 'mean': 'HRP2', 'amax': 'HRP2_max'})
+    df = df.sort_values(by=grouping_list)
+    df['Ref_HRP2'] = 0.0
+    df['Distance'] = 0.0
+
+    ages = df['Age'].unique()
+    for ai in ages:
+        ref_pre = analyzer.reference_dict['pre']['Ref_HRP2_%s_to_%s' % (ai, ai + 1)]
+        ref_post = analyzer.reference_dict['post']['Ref_HRP2_%s_to_%s' % (ai, ai + 1)]
+        df.loc[((df['day'] == 239) & (df['Age'] == ai)), 'Ref_HRP2'] = ref_pre
+        df.loc[((df['day'] == 604) & (df['Age'] == ai)), 'Ref_HRP2'] = ref_post
+        df.loc[((df['day'] == 239) & (df['Age'] == ai)), 'Distance'] = np.sqrt(
+            (df.loc[((df['day'] == 239) & (df['Age'] == ai)), 'HRP2'] - ref_pre) ** 2)
+        df.loc[((df['day'] == 604) & (df['Age'] == ai)), 'Distance'] = np.sqrt(
+            (df.loc[((df['day'] == 604) & (df['Age'] == ai)), 'HRP2'] - ref_post) ** 2)
+
+    df['Total_distance'] = 0.0
+    samples = df['Sample_Number'].unique()
+    for si in samples:
+        df.loc[((df['Sample_Number'] == si) & (df['day'] == 239)), 'Total_distance'] = df.loc[
+            ((df['Sample_Number'] == si) & (df['day'] == 239)), 'Distance'].sum()
+        df.loc[((df['Sample_Number'] == si) & (df['day'] == 604)), 'Total_distance'] = df.loc[
+            ((df['Sample_Number'] == si) & (df['day'] == 604)), 'Distance'].sum()
+
+    df.to_csv(out_file)
+
+
+def event_counter(rng, channels, survey_days):
+    '''
+    ReportEventCounter with tests on the survey days only, over 3 years
+    '''
+    n_days = 3 * 365
+    data = {}
+    for channel in channels:
+        values = np.zeros(n_days)
+        days = n_days - 730 + np.asarray(survey_days)
+        if channel.startswith('Received_Test'):
+            values[days] = rng.integers(50, 100, len(days))
+        else:
+            values[days] = rng.integers(0, 50, len(days))
+        data[channel] = {'Data': values.tolist()}
+    return {'Channels': data}
+
+
+def test_finalize_matches_baseline(tmp_path):
+    rng = np.random.default_rng(0)
+    analyzer = HRP2PrevalenceAnalyzer('hrp2', sweep_variables=list(SWEEP_VARIABLES),
+                                      working_dir=str(tmp_path))
+    # Survey days of the reference data and one day without reference
+    survey_days = [239, 400, 604]
+
+    all_data = {}
+    for i, (coverage, sample) in enumerate([(c, s) for c in (0.0, 0.8) for s in range(3)]):
+        simulation = Simulation('sim%d' % i, {'SMC_Coverage': coverage, 'Sample_Number': sample})
+        data = {analyzer.filenames[0]: event_counter(rng, analyzer.data_channels, survey_days)}
+        all_data[simulation] = analyzer.select_simulation_data(data, simulation)
+
+    analyzer.finalize(all_data)
+    baseline_file = str(tmp_path / 'baseline.csv')
+    baseline_finalize(analyzer, all_data, baseline_file)
+
+    with open(os.path.join(str(tmp_path), 'hrp2', 'hrp2_prevalence_hrp2.csv')) as f:
+        output = f.read()
+    with open(baseline_file) as f:
+        assert output == f.read()
+    assert analyzer.sweep_variables == SWEEP_VARIABLES